@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, timedelta
+from auth import get_db, require_admin
+from export import EXPORT_TABLES, stream_export
+from analytics import revenue_report, product_report
+from coupons import coupon_registry
+from order_lifecycle import TRANSITIONS, transition_orders
+from pydantic import BaseModel, Field
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+MAX_BATCH_TRANSITION = 10000
+MAX_REPORT_DAYS = 3660
+
+class BatchTransitionRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_TRANSITION)
+    status: str
+    description: Optional[str] = None
+
+class BatchTransitionResponse(BaseModel):
+    success: bool
+    data: dict
+
+class DailyRevenue(BaseModel):
+    day: str
+    order_count: int
+    revenue: float
+    deposit_in: float
+    deposit_out: float
+    deposit_held: float
+
+class RevenueReportResponse(BaseModel):
+    success: bool
+    data: List[DailyRevenue]
+
+class ProductUtilization(BaseModel):
+    product_id: int
+    name: str
+    rental_days: int
+    revenue: float
+    utilization: float
+
+class ProductReportResponse(BaseModel):
+    success: bool
+    data: List[ProductUtilization]
+
+class CouponMetricsResponse(BaseModel):
+    success: bool
+    data: dict
+
+def report_range(from_date: Optional[date], to_date: Optional[date]):
+    """Rentang laporan, default 30 hari terakhir"""
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=29)
+    if to_date < from_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parameter 'to' tidak boleh sebelum 'from'")
+    if (to_date - from_date).days + 1 > MAX_REPORT_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Rentang maksimal {MAX_REPORT_DAYS} hari")
+    return from_date, to_date
+
+# Endpoint: POST /admin/orders/transition
+@router.post("/orders/transition", response_model=BatchTransitionResponse)
+def batch_transition_orders(req: BatchTransitionRequest, db: Session = Depends(get_db)):
+    if req.status not in TRANSITIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Status tidak dikenal")
+    moved = transition_orders(req.order_ids, req.status, db, description=req.description)
+    db.commit()
+    skipped = sorted(set(req.order_ids) - set(moved))
+    return {"success": True, "data": {"transitioned": sorted(moved), "skipped": skipped}}
+
+# Endpoint: GET /admin/export/{table}
+@router.get("/export/{table}")
+def export_orders(
+    table: str,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    order_status: Optional[str] = Query(None, alias="status"),
+):
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tabel export tidak dikenal")
+    if from_date and to_date and to_date < from_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parameter 'to' tidak boleh sebelum 'from'")
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(table, fmt, from_date, to_date, order_status),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
+
+# Endpoint: GET /admin/analytics/revenue
+@router.get("/analytics/revenue", response_model=RevenueReportResponse)
+def get_revenue_report(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+):
+    from_date, to_date = report_range(from_date, to_date)
+    return {"success": True, "data": revenue_report(from_date, to_date, db)}
+
+# Endpoint: GET /admin/analytics/products
+@router.get("/analytics/products", response_model=ProductReportResponse)
+def get_product_report(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    from_date, to_date = report_range(from_date, to_date)
+    return {"success": True, "data": product_report(from_date, to_date, db, limit=limit)}
+
+# Endpoint: GET /admin/coupons/metrics
+@router.get("/coupons/metrics", response_model=CouponMetricsResponse)
+def get_coupon_metrics():
+    return {"success": True, "data": coupon_registry.metrics()}
+
+# Endpoint: POST /admin/coupons/reload
+@router.post("/coupons/reload", response_model=CouponMetricsResponse)
+def reload_coupons(db: Session = Depends(get_db)):
+    """Muat ulang registry kupon setelah tabel coupons diubah"""
+    coupon_registry.reload(db)
+    return {"success": True, "data": coupon_registry.metrics()}
@@ -0,0 +1,38 @@
+"""add popularity counters to products
+
+Revision ID: 2d9f5b7e3a81
+Revises: 6c2e8f4a1d93
+Create Date: 2026-10-19 19:48:26.731905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d9f5b7e3a81'
+down_revision: Union[str, None] = '6c2e8f4a1d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('favorite_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rental_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rental_days', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('popularity_score', sa.Float(), nullable=False, server_default='0'))
+    op.create_index('ix_products_popularity', 'products', ['popularity_score', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_popularity', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('popularity_score')
+        batch_op.drop_column('rental_days')
+        batch_op.drop_column('rental_count')
+        batch_op.drop_column('favorite_count')
@@ -0,0 +1,40 @@
+"""add blobs table for content-addressed uploads
+
+Revision ID: 3b8e1f0c9d2a
+Revises: f914b7b3632d
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1f0c9d2a'
+down_revision: Union[str, None] = 'f914b7b3632d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('extension', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_blobs_id'), 'blobs', ['id'], unique=False)
+    op.create_index(op.f('ix_blobs_sha256'), 'blobs', ['sha256'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_blobs_sha256'), table_name='blobs')
+    op.drop_index(op.f('ix_blobs_id'), table_name='blobs')
+    op.drop_table('blobs')
@@ -0,0 +1,38 @@
+"""add products.primary_image_url
+
+Revision ID: 3e7a9c1d5b08
+Revises: b6d3e9a17f42
+Create Date: 2026-10-19 16:58:41.209734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a9c1d5b08'
+down_revision: Union[str, None] = 'b6d3e9a17f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('primary_image_url', sa.String(), nullable=False, server_default=''))
+    op.execute("""
+        UPDATE products SET primary_image_url = COALESCE((
+            SELECT image_url FROM product_images
+            WHERE product_images.product_id = products.id
+            ORDER BY is_primary DESC, id
+            LIMIT 1
+        ), '')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('primary_image_url')
@@ -0,0 +1,33 @@
+"""add coupons usage_limit and used_count
+
+Revision ID: 5a1f7b3e9c62
+Revises: 8d2c4f6a0e19
+Create Date: 2026-10-19 18:05:47.330196
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1f7b3e9c62'
+down_revision: Union[str, None] = '8d2c4f6a0e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('coupons') as batch_op:
+        batch_op.add_column(sa.Column('usage_limit', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('used_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("UPDATE coupons SET used_count = (SELECT COUNT(*) FROM orders WHERE orders.coupon_id = coupons.id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('coupons') as batch_op:
+        batch_op.drop_column('used_count')
+        batch_op.drop_column('usage_limit')
@@ -0,0 +1,28 @@
+"""add index for keyset favorites listing
+
+Revision ID: 6c2e8f4a1d93
+Revises: 9b4e2d7c1a35
+Create Date: 2026-10-19 19:12:44.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2e8f4a1d93'
+down_revision: Union[str, None] = '9b4e2d7c1a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_favorites_user_added', 'favorites', ['user_id', 'added_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_favorites_user_added', table_name='favorites')
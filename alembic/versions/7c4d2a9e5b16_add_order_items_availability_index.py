@@ -0,0 +1,28 @@
+"""add order_items product/date index for availability lookups
+
+Revision ID: 7c4d2a9e5b16
+Revises: 3b8e1f0c9d2a
+Create Date: 2026-10-19 10:02:11.540376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4d2a9e5b16'
+down_revision: Union[str, None] = '3b8e1f0c9d2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_order_items_product_dates', 'order_items', ['product_id', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_items_product_dates', table_name='order_items')
@@ -0,0 +1,46 @@
+"""merge duplicate cart lines and add unique cart line index
+
+Revision ID: 8d2c4f6a0e19
+Revises: 3e7a9c1d5b08
+Create Date: 2026-10-19 17:36:12.884510
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2c4f6a0e19'
+down_revision: Union[str, None] = '3e7a9c1d5b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Gabungkan baris duplikat (user, produk, tanggal sama) ke baris tertua
+    op.execute("""
+        UPDATE carts SET quantity = (
+            SELECT SUM(c2.quantity) FROM carts c2
+            WHERE c2.user_id = carts.user_id AND c2.product_id = carts.product_id
+              AND c2.start_date = carts.start_date AND c2.end_date = carts.end_date
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM carts
+            GROUP BY user_id, product_id, start_date, end_date
+            HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM carts WHERE id NOT IN (
+            SELECT MIN(id) FROM carts GROUP BY user_id, product_id, start_date, end_date
+        )
+    """)
+    op.create_index('ix_carts_user_product_dates', 'carts', ['user_id', 'product_id', 'start_date', 'end_date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carts_user_product_dates', table_name='carts')
@@ -0,0 +1,34 @@
+"""remove duplicate favorites and add unique (user_id, product_id) index
+
+Revision ID: 9b4e2d7c1a35
+Revises: 5a1f7b3e9c62
+Create Date: 2026-10-19 18:41:09.562817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e2d7c1a35'
+down_revision: Union[str, None] = '5a1f7b3e9c62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Simpan favorit tertua jika ada duplikat
+    op.execute("""
+        DELETE FROM favorites WHERE id NOT IN (
+            SELECT MIN(id) FROM favorites GROUP BY user_id, product_id
+        )
+    """)
+    op.create_index('ix_favorites_user_product', 'favorites', ['user_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_favorites_user_product', table_name='favorites')
@@ -0,0 +1,39 @@
+"""add product_similarities table
+
+Revision ID: a4c7e2f9b610
+Revises: 2d9f5b7e3a81
+Create Date: 2026-10-19 20:31:05.418263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c7e2f9b610'
+down_revision: Union[str, None] = '2d9f5b7e3a81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_similarities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('neighbors', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_similarities_id'), 'product_similarities', ['id'], unique=False)
+    op.create_index(op.f('ix_product_similarities_product_id'), 'product_similarities', ['product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_product_similarities_product_id'), table_name='product_similarities')
+    op.drop_index(op.f('ix_product_similarities_id'), table_name='product_similarities')
+    op.drop_table('product_similarities')
@@ -0,0 +1,31 @@
+"""add blobs.last_used_at so GC skips blobs reused during the grace period
+
+Revision ID: a6e3c8d1f547
+Revises: f4b9d2e6a715
+Create Date: 2026-10-19 23:58:42.316904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3c8d1f547'
+down_revision: Union[str, None] = 'f4b9d2e6a715'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.add_column(sa.Column('last_used_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE blobs SET last_used_at = created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.drop_column('last_used_at')
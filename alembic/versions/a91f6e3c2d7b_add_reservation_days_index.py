@@ -0,0 +1,53 @@
+"""add reservation_days daily availability index
+
+Revision ID: a91f6e3c2d7b
+Revises: 7c4d2a9e5b16
+Create Date: 2026-10-19 11:26:53.907125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91f6e3c2d7b'
+down_revision: Union[str, None] = '7c4d2a9e5b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reservation_days',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.String(), nullable=False),
+    sa.Column('reserved', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reservation_days_id'), 'reservation_days', ['id'], unique=False)
+    op.create_index('ix_reservation_days_product_day', 'reservation_days', ['product_id', 'day'], unique=True)
+
+    # Isi index dari order yang masih aktif
+    op.execute("""
+        INSERT INTO reservation_days (product_id, day, reserved)
+        WITH RECURSIVE rental_days(product_id, day, end_date, quantity) AS (
+            SELECT oi.product_id, oi.start_date, oi.end_date, oi.quantity
+            FROM order_items oi JOIN orders o ON o.id = oi.order_id
+            WHERE o.status IN ('pending', 'ongoing') AND oi.start_date <= oi.end_date
+            UNION ALL
+            SELECT product_id, date(day, '+1 day'), end_date, quantity
+            FROM rental_days WHERE day < end_date
+        )
+        SELECT product_id, day, SUM(quantity) FROM rental_days GROUP BY product_id, day
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservation_days_product_day', table_name='reservation_days')
+    op.drop_index(op.f('ix_reservation_days_id'), table_name='reservation_days')
+    op.drop_table('reservation_days')
@@ -0,0 +1,54 @@
+"""add analytics rollup tables
+
+Revision ID: b6d3e9a17f42
+Revises: f1b4d8e27a6c
+Create Date: 2026-10-19 16:22:08.417325
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d3e9a17f42'
+down_revision: Union[str, None] = 'f1b4d8e27a6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.String(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('deposit_in', sa.Float(), nullable=False),
+    sa.Column('deposit_out', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_daily_stats_id'), 'daily_stats', ['id'], unique=False)
+    op.create_index(op.f('ix_daily_stats_day'), 'daily_stats', ['day'], unique=True)
+    op.create_table('product_daily_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.String(), nullable=False),
+    sa.Column('units_on_rent', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_daily_stats_id'), 'product_daily_stats', ['id'], unique=False)
+    op.create_index('ix_product_daily_stats_day_product', 'product_daily_stats', ['day', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_daily_stats_day_product', table_name='product_daily_stats')
+    op.drop_index(op.f('ix_product_daily_stats_id'), table_name='product_daily_stats')
+    op.drop_table('product_daily_stats')
+    op.drop_index(op.f('ix_daily_stats_day'), table_name='daily_stats')
+    op.drop_index(op.f('ix_daily_stats_id'), table_name='daily_stats')
+    op.drop_table('daily_stats')
@@ -0,0 +1,31 @@
+"""add CHECK reserved >= 0 to reservation_days
+
+Revision ID: b8f2a6d4c190
+Revises: e5b1d8c3f7a2
+Create Date: 2026-10-19 21:18:52.364019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f2a6d4c190'
+down_revision: Union[str, None] = 'e5b1d8c3f7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE reservation_days SET reserved = 0 WHERE reserved < 0")
+    with op.batch_alter_table('reservation_days') as batch_op:
+        batch_op.create_check_constraint('ck_reservation_days_reserved_nonnegative', 'reserved >= 0')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('reservation_days') as batch_op:
+        batch_op.drop_constraint('ck_reservation_days_reserved_nonnegative', type_='check')
@@ -0,0 +1,33 @@
+"""add order_worker_leases table
+
+Revision ID: c1d4f7a9e283
+Revises: b8f2a6d4c190
+Create Date: 2026-10-19 21:46:13.580927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1d4f7a9e283'
+down_revision: Union[str, None] = 'b8f2a6d4c190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_worker_leases',
+    sa.Column('worker_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('owner', sa.String(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('worker_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('order_worker_leases')
@@ -0,0 +1,30 @@
+"""add products.reservation_version for optimistic checkout locking
+
+Revision ID: c5e8b7d41f09
+Revises: a91f6e3c2d7b
+Create Date: 2026-10-19 12:40:18.331862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8b7d41f09'
+down_revision: Union[str, None] = 'a91f6e3c2d7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('reservation_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('reservation_version')
@@ -0,0 +1,30 @@
+"""add orders.version for order detail cache validation
+
+Revision ID: d7a3e5c9b214
+Revises: c1d4f7a9e283
+Create Date: 2026-10-19 22:18:40.264519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3e5c9b214'
+down_revision: Union[str, None] = 'c1d4f7a9e283'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('version')
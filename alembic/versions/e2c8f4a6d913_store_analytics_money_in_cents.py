@@ -0,0 +1,76 @@
+"""store analytics rollup money in integer cents; revenue excludes deposits
+
+Revision ID: e2c8f4a6d913
+Revises: d7a3e5c9b214
+Create Date: 2026-10-19 22:52:31.907164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c8f4a6d913'
+down_revision: Union[str, None] = 'd7a3e5c9b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('daily_stats') as batch_op:
+        batch_op.add_column(sa.Column('revenue_cents', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('deposit_in_cents', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('deposit_out_cents', sa.Integer(), nullable=False, server_default='0'))
+    with op.batch_alter_table('product_daily_stats') as batch_op:
+        batch_op.add_column(sa.Column('revenue_cents', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE daily_stats SET "
+        "deposit_in_cents = CAST(ROUND(deposit_in * 100) AS INTEGER), "
+        "deposit_out_cents = CAST(ROUND(deposit_out * 100) AS INTEGER)"
+    )
+    # Omzet lama ikut menghitung deposit: hitung ulang dari order (subtotal item - diskon)
+    op.execute(
+        "UPDATE daily_stats SET revenue_cents = COALESCE(("
+        " SELECT SUM(MAX(items.subtotal_cents - CAST(ROUND(COALESCE(orders.discount_amount, 0) * 100) AS INTEGER), 0))"
+        " FROM orders JOIN ("
+        "  SELECT order_id, SUM(CAST(ROUND(COALESCE(subtotal, 0) * 100) AS INTEGER)) AS subtotal_cents"
+        "  FROM order_items GROUP BY order_id"
+        " ) AS items ON items.order_id = orders.id"
+        " WHERE date(orders.created_at) = daily_stats.day"
+        "), 0)"
+    )
+    op.execute("UPDATE product_daily_stats SET revenue_cents = CAST(ROUND(revenue * 100) AS INTEGER)")
+
+    with op.batch_alter_table('daily_stats') as batch_op:
+        batch_op.drop_column('revenue')
+        batch_op.drop_column('deposit_in')
+        batch_op.drop_column('deposit_out')
+    with op.batch_alter_table('product_daily_stats') as batch_op:
+        batch_op.drop_column('revenue')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('daily_stats') as batch_op:
+        batch_op.add_column(sa.Column('revenue', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('deposit_in', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('deposit_out', sa.Float(), nullable=False, server_default='0'))
+    with op.batch_alter_table('product_daily_stats') as batch_op:
+        batch_op.add_column(sa.Column('revenue', sa.Float(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE daily_stats SET revenue = revenue_cents / 100.0, "
+        "deposit_in = deposit_in_cents / 100.0, deposit_out = deposit_out_cents / 100.0"
+    )
+    op.execute("UPDATE product_daily_stats SET revenue = revenue_cents / 100.0")
+
+    with op.batch_alter_table('daily_stats') as batch_op:
+        batch_op.drop_column('revenue_cents')
+        batch_op.drop_column('deposit_in_cents')
+        batch_op.drop_column('deposit_out_cents')
+    with op.batch_alter_table('product_daily_stats') as batch_op:
+        batch_op.drop_column('revenue_cents')
@@ -0,0 +1,29 @@
+"""drop unused order_items product/date index
+
+Revision ID: e5b1d8c3f7a2
+Revises: a4c7e2f9b610
+Create Date: 2026-10-19 21:05:37.902164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1d8c3f7a2'
+down_revision: Union[str, None] = 'a4c7e2f9b610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cek stok sudah dibaca dari reservation_days, index ini hanya menambah biaya tulis
+    op.drop_index('ix_order_items_product_dates', table_name='order_items')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_order_items_product_dates', 'order_items', ['product_id', 'start_date', 'end_date'], unique=False)
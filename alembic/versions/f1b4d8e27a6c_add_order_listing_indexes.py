@@ -0,0 +1,30 @@
+"""add indexes for keyset order listing and item counts
+
+Revision ID: f1b4d8e27a6c
+Revises: e8a3c6f05b21
+Create Date: 2026-10-19 15:47:30.615842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b4d8e27a6c'
+down_revision: Union[str, None] = 'e8a3c6f05b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index('ix_orders_user_created', table_name='orders')
@@ -0,0 +1,34 @@
+"""add popularity_state table for the movable popularity epoch
+
+Revision ID: f4b9d2e6a715
+Revises: e2c8f4a6d913
+Create Date: 2026-10-19 23:31:07.648210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b9d2e6a715'
+down_revision: Union[str, None] = 'e2c8f4a6d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('popularity_state',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('epoch', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Skor yang sudah ada dihitung dengan epoch tetap lama (popularity.POPULARITY_EPOCH)
+    op.execute("INSERT INTO popularity_state (id, epoch) VALUES (1, '2026-01-01 00:00:00.000000')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('popularity_state')
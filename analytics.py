@@ -0,0 +1,186 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from availability import days_between, iter_days, parse_date
+from db import SessionLocal
+from models import DailyStats, Order, OrderItem, OrderTimeline, Product, ProductDailyStats
+from pricing import from_cents, to_cents
+
+# Laporan sewa dibaca dari tabel rollup (daily_stats, product_daily_stats) yang
+# ditambah sedikit demi sedikit di transaksi yang sama dengan order dibuat /
+# dikembalikan, jadi laporan tidak pernah scan tabel orders / order_items.
+# Data lama (sebelum rollup ada) diisi dengan: python analytics.py
+# Uang disimpan dalam sen (integer, seperti pricing.py) dan dikonversi ke float
+# hanya di laporan. Omzet = subtotal sewa - diskon; deposit dicatat terpisah
+# (deposit_in / deposit_out) karena dikembalikan ke user.
+
+# (product_id, quantity, start_date, end_date, subtotal)
+RentalRow = Tuple[int, int, str, str, float]
+REBUILD_BATCH_SIZE = 1000
+# Baris per statement upsert (batas jumlah parameter SQLite)
+UPSERT_CHUNK_SIZE = 500
+
+# Helper
+
+def _chunks(values: list, size: int = UPSERT_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def order_revenue_cents(subtotal_cents: int, discount_amount) -> int:
+    """Omzet satu order: subtotal sewa dikurangi diskon kupon, tanpa deposit"""
+    return max(subtotal_cents - to_cents(discount_amount), 0)
+
+def _add_daily(deltas: Dict[str, Dict[str, int]], db: Session):
+    values = [
+        {"day": day, "order_count": 0, "revenue_cents": 0, "deposit_in_cents": 0, "deposit_out_cents": 0, **delta}
+        for day, delta in deltas.items()
+    ]
+    for chunk in _chunks(values):
+        stmt = insert(DailyStats).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyStats.day],
+            set_={
+                "order_count": DailyStats.order_count + stmt.excluded.order_count,
+                "revenue_cents": DailyStats.revenue_cents + stmt.excluded.revenue_cents,
+                "deposit_in_cents": DailyStats.deposit_in_cents + stmt.excluded.deposit_in_cents,
+                "deposit_out_cents": DailyStats.deposit_out_cents + stmt.excluded.deposit_out_cents,
+            },
+        )
+        db.execute(stmt)
+
+def _add_product_days(rows: Iterable[RentalRow], db: Session):
+    deltas = defaultdict(lambda: [0, 0])
+    for product_id, quantity, start_date, end_date, subtotal in rows:
+        start, end = parse_date(start_date), parse_date(end_date)
+        # Subtotal dibagi rata per hari sewa; sisa sen diberikan ke hari-hari pertama supaya jumlahnya tepat
+        per_day, remainder = divmod(to_cents(subtotal), max(days_between(start, end), 1))
+        for i, day in enumerate(iter_days(start, end)):
+            delta = deltas[(day.isoformat(), product_id)]
+            delta[0] += quantity
+            delta[1] += per_day + (i < remainder)
+    values = [
+        {"day": day, "product_id": product_id, "units_on_rent": units, "revenue_cents": revenue}
+        for (day, product_id), (units, revenue) in deltas.items()
+    ]
+    for chunk in _chunks(values):
+        stmt = insert(ProductDailyStats).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductDailyStats.day, ProductDailyStats.product_id],
+            set_={
+                "units_on_rent": ProductDailyStats.units_on_rent + stmt.excluded.units_on_rent,
+                "revenue_cents": ProductDailyStats.revenue_cents + stmt.excluded.revenue_cents,
+            },
+        )
+        db.execute(stmt)
+
+# Update rollup (dipanggil tanpa commit, ikut transaksi pemanggil)
+
+def record_order(order: Order, rows: List[RentalRow], db: Session):
+    """Order baru: tambah omzet & deposit hari ini dan unit tersewa per hari sewa"""
+    day = (order.created_at or datetime.utcnow()).date().isoformat()
+    revenue = order_revenue_cents(sum(to_cents(row[4]) for row in rows), order.discount_amount)
+    _add_daily({day: {"order_count": 1, "revenue_cents": revenue, "deposit_in_cents": to_cents(order.deposit_total)}}, db)
+    _add_product_days(rows, db)
+
+def record_returns(order_ids: List[int], db: Session, returned_at: Optional[datetime] = None):
+    """Order dikembalikan: deposit keluar pada hari pengembalian"""
+    if not order_ids:
+        return
+    deposit = sum(to_cents(amount) for (amount,) in db.query(Order.deposit_total).filter(Order.id.in_(order_ids)))
+    day = (returned_at or datetime.utcnow()).date().isoformat()
+    _add_daily({day: {"deposit_out_cents": deposit}}, db)
+
+# Laporan
+
+def revenue_report(start: date, end: date, db: Session) -> List[dict]:
+    """Omzet & deposit per hari dalam [start, end], termasuk saldo deposit yang masih dipegang"""
+    held = db.query(func.coalesce(func.sum(DailyStats.deposit_in_cents - DailyStats.deposit_out_cents), 0)).filter(DailyStats.day < start.isoformat()).scalar()
+    rows = {
+        day: values
+        for day, *values in db.query(DailyStats.day, DailyStats.order_count, DailyStats.revenue_cents, DailyStats.deposit_in_cents, DailyStats.deposit_out_cents)
+        .filter(DailyStats.day >= start.isoformat(), DailyStats.day <= end.isoformat())
+    }
+    report = []
+    for day in iter_days(start, end):
+        order_count, revenue, deposit_in, deposit_out = rows.get(day.isoformat(), (0, 0, 0, 0))
+        held += deposit_in - deposit_out
+        report.append({
+            "day": day.isoformat(),
+            "order_count": order_count,
+            "revenue": from_cents(revenue),
+            "deposit_in": from_cents(deposit_in),
+            "deposit_out": from_cents(deposit_out),
+            "deposit_held": from_cents(held),
+        })
+    return report
+
+def product_report(start: date, end: date, db: Session, limit: Optional[int] = None) -> List[dict]:
+    """Produk diurutkan berdasarkan unit-hari tersewa, dengan utilisasi terhadap stock_quantity"""
+    rental_days = func.sum(ProductDailyStats.units_on_rent).label("rental_days")
+    query = (
+        db.query(ProductDailyStats.product_id, Product.name, Product.stock_quantity, rental_days, func.sum(ProductDailyStats.revenue_cents))
+        .join(Product, Product.id == ProductDailyStats.product_id)
+        .filter(ProductDailyStats.day >= start.isoformat(), ProductDailyStats.day <= end.isoformat())
+        .group_by(ProductDailyStats.product_id)
+        .order_by(rental_days.desc(), ProductDailyStats.product_id)
+    )
+    if limit:
+        query = query.limit(limit)
+    capacity_days = days_between(start, end)
+    return [
+        {
+            "product_id": product_id,
+            "name": name,
+            "rental_days": days,
+            "revenue": from_cents(revenue),
+            "utilization": round(days / (stock * capacity_days), 4) if stock else 0,
+        }
+        for product_id, name, stock, days, revenue in query
+    ]
+
+def rebuild(db: Session):
+    """Hitung ulang semua rollup dari tabel orders (untuk data lama / perbaikan)"""
+    db.query(DailyStats).delete(synchronize_session=False)
+    db.query(ProductDailyStats).delete(synchronize_session=False)
+    daily = defaultdict(lambda: defaultdict(int))
+    # Subtotal per order dalam sen, dijumlah per item seperti record_order
+    subtotals = defaultdict(int)
+    for order_id, subtotal in db.query(OrderItem.order_id, OrderItem.subtotal).yield_per(REBUILD_BATCH_SIZE):
+        subtotals[order_id] += to_cents(subtotal)
+    orders = db.query(Order.id, Order.created_at, Order.discount_amount, Order.deposit_total).yield_per(REBUILD_BATCH_SIZE)
+    for order_id, created_at, discount_amount, deposit_total in orders:
+        values = daily[(created_at or datetime.utcnow()).date().isoformat()]
+        values["order_count"] += 1
+        values["revenue_cents"] += order_revenue_cents(subtotals.pop(order_id, 0), discount_amount)
+        values["deposit_in_cents"] += to_cents(deposit_total)
+    returned = (
+        db.query(OrderTimeline.created_at, Order.deposit_total)
+        .join(Order, Order.id == OrderTimeline.order_id)
+        .filter(OrderTimeline.status == "returned")
+        .yield_per(REBUILD_BATCH_SIZE)
+    )
+    for returned_at, deposit_total in returned:
+        daily[(returned_at or datetime.utcnow()).date().isoformat()]["deposit_out_cents"] += to_cents(deposit_total)
+    _add_daily(daily, db)
+    items = db.query(OrderItem.product_id, OrderItem.quantity, OrderItem.start_date, OrderItem.end_date, OrderItem.subtotal)
+    batch = []
+    for row in items.yield_per(REBUILD_BATCH_SIZE):
+        batch.append(tuple(row))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            _add_product_days(batch, db)
+            batch = []
+    _add_product_days(batch, db)
+    db.commit()
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print("Rollup analytics selesai dihitung ulang.")
+    finally:
+        db.close()
@@ -8,10 +8,13 @@ from jose import jwt, JWTError
 from datetime import timedelta, datetime
 from db import SessionLocal
 from models import User, BlacklistedToken
+import os
+import secrets
 
 SECRET_KEY = "supersecretkey"  # Ganti di produksi
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")  # Kosong = endpoint admin nonaktif
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -69,6 +72,11 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         raise credentials_exception
     return user
 
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Endpoint admin memakai header X-Admin-Key yang dicocokkan dengan env ADMIN_API_KEY"""
+    if not ADMIN_API_KEY or not x_admin_key or not secrets.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Akses admin ditolak")
+
 def cleanup_expired_tokens(db: Session):
     """Membersihkan token yang sudah expired dari blacklist"""
     now = datetime.utcnow()
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, case, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import OrderItem, Product, ReservationDay
+
+# (product, start_date, end_date, quantity) - tanggal format YYYY-MM-DD
+RentalLine = Tuple[Product, str, str, int]
+
+class ReservationConflict(Exception):
+    """Versi reservasi produk berubah di tengah checkout (booking lain sudah lebih dulu commit)"""
+
+class ReservationMismatch(Exception):
+    """Pengembalian untuk hari yang tidak pernah di-booking (index reservation_days tidak konsisten)"""
+
+# Helper
+
+def parse_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def days_between(start: date, end: date) -> int:
+    return (end - start).days + 1
+
+def iter_days(start: date, end: date) -> Iterable[date]:
+    for offset in range(days_between(start, end)):
+        yield start + timedelta(days=offset)
+
+def reserved_per_day(product_ids: Iterable[int], start: date, end: date, db: Session) -> Dict[int, List[int]]:
+    """Jumlah unit tersewa per hari dalam [start, end] untuk tiap produk, dibaca dari index reservation_days"""
+    product_ids = list(set(product_ids))
+    size = days_between(start, end)
+    result = {pid: [0] * max(size, 0) for pid in product_ids}
+    if not product_ids or size <= 0:
+        return result
+    rows = (
+        db.query(ReservationDay.product_id, ReservationDay.day, ReservationDay.reserved)
+        .filter(ReservationDay.product_id.in_(product_ids))
+        .filter(ReservationDay.day >= start.isoformat(), ReservationDay.day <= end.isoformat())
+        .all()
+    )
+    for product_id, day, reserved in rows:
+        result[product_id][(parse_date(day) - start).days] = reserved
+    return result
+
+def free_per_day(product: Product, start: date, end: date, db: Session) -> List[int]:
+    """Kalender unit tersedia per hari.
+
+    Tidak di-cache: satu range scan di index reservation_days sudah murah, dan
+    cache per proses akan basi saat proses lain booking atau stok diubah.
+    """
+    reserved = reserved_per_day([product.id], start, end, db)[product.id]
+    return [max(product.stock_quantity - r, 0) for r in reserved]
+
+def ensure_available(lines: List[RentalLine], db: Session):
+    """Raise 400 jika ada produk yang stoknya tidak cukup untuk semua baris sewa (termasuk baris yang saling overlap)"""
+    if not lines:
+        return
+    parsed = [(product, parse_date(s), parse_date(e), quantity) for product, s, e, quantity in lines]
+    if any(e < s for _, s, e, _ in parsed):
+        raise HTTPException(status_code=400, detail="Tanggal selesai tidak boleh sebelum tanggal mulai")
+    window_start = min(s for _, s, _, _ in parsed)
+    window_end = max(e for _, _, e, _ in parsed)
+    reserved = reserved_per_day([p.id for p, _, _, _ in parsed], window_start, window_end, db)
+
+    requested = defaultdict(lambda: [0] * (days_between(window_start, window_end) + 1))
+    products = {}
+    for product, s, e, quantity in parsed:
+        products[product.id] = product
+        diff = requested[product.id]
+        diff[(s - window_start).days] += quantity
+        diff[(e - window_start).days + 1] -= quantity
+
+    for product_id, diff in requested.items():
+        product = products[product_id]
+        running = 0
+        for day, booked in enumerate(reserved[product_id]):
+            running += diff[day]
+            if running and booked + running > product.stock_quantity:
+                available = max(product.stock_quantity - booked, 0)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Stok {product.name} tidak mencukupi pada {(window_start + timedelta(days=day)).isoformat()} (tersedia {available})"
+                )
+
+def read_versions(product_ids: Iterable[int], db: Session) -> Dict[int, int]:
+    """Snapshot reservation_version produk, dibaca sebelum cek stok"""
+    rows = db.query(Product.id, Product.reservation_version).filter(Product.id.in_(set(product_ids))).all()
+    return {product_id: version for product_id, version in rows}
+
+def claim_versions(versions: Dict[int, int], db: Session):
+    """Optimistic lock: naikkan versi hanya jika belum berubah sejak read_versions, raise ReservationConflict jika sudah"""
+    if not versions:
+        return
+    expected = case(versions, value=Product.id)
+    updated = (
+        db.query(Product)
+        .filter(Product.id.in_(list(versions)), Product.reservation_version == expected)
+        .update({Product.reservation_version: Product.reservation_version + 1}, synchronize_session=False)
+    )
+    if updated != len(versions):
+        raise ReservationConflict(sorted(versions))
+
+def _reservation_deltas(items: List[OrderItem]) -> Dict[Tuple[int, str], int]:
+    deltas = defaultdict(int)
+    for item in items:
+        for day in iter_days(parse_date(item.start_date), parse_date(item.end_date)):
+            deltas[(item.product_id, day.isoformat())] += item.quantity
+    return deltas
+
+def book(items: List[OrderItem], db: Session):
+    """Tambah index reservation_days untuk baris sewa (OrderItem / Cart)"""
+    deltas = _reservation_deltas(items)
+    if not deltas:
+        return
+    stmt = insert(ReservationDay).values([
+        {"product_id": product_id, "day": day, "reserved": delta}
+        for (product_id, day), delta in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReservationDay.product_id, ReservationDay.day],
+        set_={"reserved": ReservationDay.reserved + stmt.excluded.reserved},
+    )
+    db.execute(stmt)
+
+def release(items: List[OrderItem], db: Session):
+    """Kurangi index reservation_days saat barang kembali.
+
+    Tidak di-clamp: pengembalian ganda melanggar CHECK reserved >= 0 (IntegrityError)
+    dan hari yang tidak pernah di-booking menghasilkan ReservationMismatch, jadi
+    transaksinya gagal alih-alih diam-diam merusak stok.
+    """
+    deltas = _reservation_deltas(items)
+    if not deltas:
+        return
+    stmt = (
+        update(ReservationDay.__table__)
+        .where(ReservationDay.product_id == bindparam("p_id"), ReservationDay.day == bindparam("p_day"))
+        .values(reserved=ReservationDay.reserved - bindparam("p_delta"))
+    )
+    result = db.connection().execute(stmt, [
+        {"p_id": product_id, "p_day": day, "p_delta": delta}
+        for (product_id, day), delta in deltas.items()
+    ])
+    if result.rowcount != len(deltas):
+        raise ReservationMismatch(f"{len(deltas) - result.rowcount} hari reservasi tidak ditemukan saat pengembalian")
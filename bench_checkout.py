@@ -0,0 +1,91 @@
+import contextlib
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Benchmark latensi checkout (POST /orders) terhadap ukuran cart, di DB sementara.
+# python bench_checkout.py [ulangan per ukuran]
+# DB harus di-set sebelum modul aplikasi di-import.
+_TMP = tempfile.mkdtemp(prefix="camptogo-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/bench.db"
+os.environ["UPLOAD_TMP_DIRECTORY"] = os.path.join(_TMP, "upload_tmp")
+os.environ["JOB_WORKER_ENABLED"] = "0"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from auth import get_password_hash
+from cart import MAX_CART_LINES
+from db import SessionLocal, engine
+from models import Address, Cart, Category, PaymentMethod, Product, User
+
+CART_SIZES = [size for size in (1, 5, 10, 25, 50) if size <= MAX_CART_LINES]
+PRODUCT_COUNT = 20
+
+def setup(db):
+    category = Category(name="Bench", description="", icon_url="")
+    db.add(category)
+    db.flush()
+    products = [
+        Product(name=f"Produk {i}", description="", price_per_day=10000 + i, original_price=10000 + i, discount_percentage=0,
+                deposit_amount=50000, stock_quantity=1_000_000, category_id=category.id)
+        for i in range(PRODUCT_COUNT)
+    ]
+    user = User(full_name="Bench", email="bench@example.com", hashed_password=get_password_hash("password123"))
+    db.add_all(products + [user])
+    db.flush()
+    address = Address(user_id=user.id, recipient_name="Bench", full_address="-", phone_number="0")
+    payment = PaymentMethod(user_id=user.id, method_type="bank", provider_name="-", account_number="0", account_name="Bench")
+    db.add_all([address, payment])
+    db.commit()
+    return user.id, [p.id for p in products], address.id, payment.id
+
+def fill_cart(db, user_id: int, product_ids, size: int, run: int):
+    # Tanggal unik per baris supaya tidak digabung oleh index unik cart
+    base = date(2032, 1, 1) + timedelta(days=run * 200)
+    db.add_all([
+        Cart(user_id=user_id, product_id=product_ids[i % len(product_ids)],
+             start_date=(base + timedelta(days=i)).isoformat(), end_date=(base + timedelta(days=i + 3)).isoformat(), quantity=1)
+        for i in range(size)
+    ])
+    db.commit()
+
+def post(client, url: str, **kwargs):
+    # auth.py mencetak token ke stdout; jangan campur dengan hasil benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        return client.post(url, **kwargs)
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    logging.disable(logging.INFO)
+    client = TestClient(main.app)
+    db = SessionLocal()
+    user_id, product_ids, address_id, payment_id = setup(db)
+    token = post(client, "/auth/login", json={"email": "bench@example.com", "password": "password123"}).json()["data"]["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    statements = [0]
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+    run = 0
+    print(f"{'baris':>5} {'median ms':>10} {'p95 ms':>8} {'statement':>9}")
+    for size in CART_SIZES:
+        latencies, counts = [], []
+        for _ in range(runs):
+            fill_cart(db, user_id, product_ids, size, run)
+            run += 1
+            statements[0] = 0
+            started = time.perf_counter()
+            response = post(client, "/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+            latencies.append((time.perf_counter() - started) * 1000)
+            counts.append(statements[0])
+            assert response.status_code == 200, response.text
+        latencies.sort()
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        print(f"{size:>5} {statistics.median(latencies):>10.1f} {p95:>8.1f} {max(counts):>9}")
+    db.close()
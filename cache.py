@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Cache in-memory per proses. Dengan beberapa worker uvicorn tiap proses punya
+# salinan sendiri, jadi data yang di-cache harus aman jika sedikit basi atau
+# selalu di-invalidate oleh proses yang mengubah datanya.
+
+class LRUCache:
+    """Dict LRU thread-safe dengan batas jumlah entry (maxsize 0 = cache nonaktif)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+def after_commit(db: Session, callback: Callable[[], None]):
+    """Jalankan callback setelah transaksi db berhasil commit (untuk invalidasi cache).
+    Callback dibuang jika transaksi di-rollback."""
+    db.info.setdefault("after_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    # Event ini juga terpanggil saat savepoint (begin_nested) di-release;
+    # callback baru boleh jalan setelah transaksi luar benar-benar commit
+    if session.in_nested_transaction():
+        return
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session):
+    session.info.pop("after_commit", None)
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Header
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-from datetime import datetime, date
-from models import Cart, Product, ProductImage, Coupon, User, Favorite
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Tuple
+from datetime import date
+from models import Cart, Product, User
 from auth import get_db, get_current_user
-from pydantic import BaseModel
+from availability import ensure_available
+from coupons import coupon_registry
+from favorites import get_favorite_ids
+from idempotency import run_idempotent, save_response
+from pricing import Quote, price_lines
+from pydantic import BaseModel, Field
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
+MAX_PREVIEW_ITEMS = 500
+MAX_CART_OPERATIONS = 100
+MAX_CART_LINES = 50
+
 # Response Models
 class CartProductItem(BaseModel):
     id: int
@@ -40,6 +50,14 @@ class CartListResponse(BaseModel):
     success: bool
     data: dict
 
+class CartSummaryData(CartSummary):
+    item_count: int
+    total_quantity: int
+
+class CartSummaryResponse(BaseModel):
+    success: bool
+    data: CartSummaryData
+
 class SimpleResponse(BaseModel):
     success: bool
     message: str
@@ -58,50 +76,29 @@ class ValidateCouponResponse(BaseModel):
 
 # Helper
 
-def calculate_days(start_date: str, end_date: str) -> int:
-    d1 = datetime.strptime(start_date, "%Y-%m-%d").date()
-    d2 = datetime.strptime(end_date, "%Y-%m-%d").date()
-    return (d2 - d1).days + 1
+def cart_summary(quote: Quote, quantities: List[int]) -> CartSummaryData:
+    """Ringkasan cart langsung dari total Quote (sudah dihitung dalam sen oleh pricing)"""
+    return CartSummaryData(
+        item_count=len(quantities),
+        total_quantity=sum(quantities),
+        total_rental=quote.subtotal,
+        total_deposit=quote.deposit_total,
+        total_amount=quote.total_amount
+    )
 
-def get_cart_items(user: User, db: Session):
-    items = db.query(Cart).filter(Cart.user_id == user.id).options(joinedload(Cart.product).joinedload(Product.images)).all()
-    result = []
-    total_rental = 0
-    total_deposit = 0
-    for item in items:
-        product = item.product
-        days_count = calculate_days(item.start_date, item.end_date)
-        subtotal = product.price_per_day * days_count * item.quantity
-        deposit_subtotal = product.deposit_amount * item.quantity
-        total_rental += subtotal
-        total_deposit += deposit_subtotal
-        # Ambil gambar primary jika ada, jika tidak ada ambil gambar pertama
-        primary_image = None
-        if product.images:
-            for img in product.images:
-                if getattr(img, 'is_primary', False):
-                    primary_image = img.image_url
-                    break
-            if not primary_image:
-                primary_image = product.images[0].image_url
-        else:
-            primary_image = ""
-            
-        # Cek apakah produk ada di favorites
-        is_favorited = db.query(Favorite).filter(
-            Favorite.user_id == user.id,
-            Favorite.product_id == product.id
-        ).first() is not None
-            
-        result.append(CartItem(
+def build_cart_lines(items: List[Cart]) -> Tuple[List[CartItem], Quote]:
+    """Hitung baris cart (tanpa status favorit) + Quote-nya untuk item yang product-nya sudah dimuat"""
+    quote = price_lines([(item.product, item.start_date, item.end_date, item.quantity) for item in items])
+    lines = [
+        CartItem(
             id=item.id,
             product=CartProductItem(
-                id=product.id,
-                name=product.name,
-                image_url=primary_image,
-                price_per_day=product.price_per_day,
-                deposit_amount=product.deposit_amount,
-                isFavorited=is_favorited
+                id=item.product.id,
+                name=item.product.name,
+                image_url=item.product.primary_image_url,
+                price_per_day=item.product.price_per_day,
+                deposit_amount=item.product.deposit_amount,
+                isFavorited=False
             ),
             start_date=item.start_date,
             end_date=item.end_date,
@@ -109,13 +106,24 @@ def get_cart_items(user: User, db: Session):
             quantity=item.quantity,
             subtotal=subtotal,
             deposit_subtotal=deposit_subtotal
-        ))
-    summary = CartSummary(
-        total_rental=total_rental,
-        total_deposit=total_deposit,
-        total_amount=total_rental + total_deposit
-    )
-    return result, summary
+        )
+        for item, days_count, subtotal, deposit_subtotal in zip(items, quote.days, quote.subtotals, quote.deposits)
+    ]
+    return lines, quote
+
+def load_cart(user: User, db: Session) -> List[Cart]:
+    # Dihitung dari DB setiap request (tidak di-cache): harga produk dan cart bisa diubah proses lain
+    return db.query(Cart).filter(Cart.user_id == user.id).options(joinedload(Cart.product)).order_by(Cart.id).all()
+
+def get_cart_items(user: User, db: Session):
+    # Satu query cart+produk (harga terbaru); id favorit dari satu query favorites
+    lines, quote = build_cart_lines(load_cart(user, db))
+    favorited = get_favorite_ids(user.id, db) if lines else frozenset()
+    result = [
+        item.model_copy(update={"product": item.product.model_copy(update={"isFavorited": item.product.id in favorited})})
+        for item in lines
+    ]
+    return result, CartSummary(total_rental=quote.subtotal, total_deposit=quote.deposit_total, total_amount=quote.total_amount)
 
 # Endpoint: GET /cart
 @router.get("", response_model=CartListResponse)
@@ -123,6 +131,118 @@ def get_cart(user: User = Depends(get_current_user), db: Session = Depends(get_d
     items, summary = get_cart_items(user, db)
     return {"success": True, "data": {"items": items, "summary": summary}}
 
+# Endpoint: GET /cart/summary
+@router.get("/summary", response_model=CartSummaryResponse)
+def get_cart_summary(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Harga dibaca ulang setiap request; cukup kolom harga, tanpa memuat baris produk lengkap
+    rows = (
+        db.query(Cart.start_date, Cart.end_date, Cart.quantity, Product.id, Product.price_per_day, Product.deposit_amount)
+        .join(Product, Product.id == Cart.product_id)
+        .filter(Cart.user_id == user.id)
+        .all()
+    )
+    quote = price_lines([(row, row.start_date, row.end_date, row.quantity) for row in rows])
+    return {"success": True, "data": cart_summary(quote, [row.quantity for row in rows])}
+
+class CartOperation(BaseModel):
+    op: str = Field(..., pattern="^(add|update|delete)$")
+    cart_id: Optional[int] = None     # update / delete
+    product_id: Optional[int] = None  # add
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    quantity: Optional[int] = None
+
+def cart_key(item: Cart):
+    return (item.product_id, item.start_date, item.end_date)
+
+def _apply_cart_operations(user: User, operations: List[CartOperation], db: Session):
+    # Seluruh cart user dimuat sekali (maksimal MAX_CART_LINES baris) untuk cek duplikat dan batas baris
+    rows = {item.id: item for item in db.query(Cart).filter(Cart.user_id == user.id)}
+    by_key = {cart_key(item): item for item in rows.values()}
+    # Validasi semua produk dengan satu query
+    product_ids = {o.product_id for o in operations if o.op == "add"} | {item.product_id for item in rows.values()}
+    if None in product_ids:
+        raise HTTPException(status_code=400, detail="product_id wajib untuk add")
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids))}
+    if len(products) != len(product_ids):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    touched = {}
+
+    def remove(item: Cart):
+        del rows[item.id]
+        del by_key[cart_key(item)]
+        touched.pop(item.id, None)
+        db.delete(item)
+
+    for o in operations:
+        if o.op != "add" and o.cart_id not in rows:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        if o.op == "delete":
+            remove(rows[o.cart_id])
+            db.flush()
+            continue
+        if o.op == "add":
+            if o.start_date is None or o.end_date is None or o.quantity is None:
+                raise HTTPException(status_code=400, detail="start_date, end_date dan quantity wajib untuk add")
+            item, quantity = None, o.quantity
+        else:
+            item = rows[o.cart_id]
+            quantity = o.quantity if o.quantity is not None else item.quantity
+        start_date = str(o.start_date) if o.start_date is not None else item.start_date
+        end_date = str(o.end_date) if o.end_date is not None else item.end_date
+        if quantity < 1:
+            raise HTTPException(status_code=400, detail="Quantity minimal 1")
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="Tanggal selesai tidak boleh sebelum tanggal mulai")
+        product_id = o.product_id if item is None else item.product_id
+        existing = by_key.get((product_id, start_date, end_date))
+
+        if existing is not None and existing is not item:
+            # Produk + tanggal sama sudah ada: gabungkan ke baris itu (increment atomik di SQL)
+            existing.quantity = Cart.quantity + quantity
+            touched[existing.id] = existing
+            if item is not None:
+                remove(item)
+        elif item is None:
+            if len(rows) >= MAX_CART_LINES:
+                raise HTTPException(status_code=400, detail=f"Keranjang maksimal {MAX_CART_LINES} item")
+            item = Cart(user_id=user.id, product_id=product_id, start_date=start_date, end_date=end_date, quantity=quantity)
+            db.add(item)
+            db.flush()
+            rows[item.id] = item
+            by_key[cart_key(item)] = item
+            touched[item.id] = item
+        else:
+            del by_key[cart_key(item)]
+            item.start_date, item.end_date, item.quantity = start_date, end_date, quantity
+            by_key[cart_key(item)] = item
+            touched[item.id] = item
+        # Flush per operasi supaya urutan UPDATE tidak pernah melanggar index unik sementara
+        db.flush()
+
+    # Cek stok semua baris yang ditambah/diubah sekaligus, seperti saat checkout
+    ensure_available([(products[item.product_id], item.start_date, item.end_date, item.quantity) for item in touched.values()], db)
+
+def apply_cart_operations(user: User, operations: List[CartOperation], db: Session, response: Optional[dict] = None):
+    """Terapkan operasi cart dalam satu transaksi. response (jika ada) disimpan
+    untuk Idempotency-Key di transaksi yang sama"""
+    for attempt in range(2):
+        try:
+            _apply_cart_operations(user, operations, db)
+            if response is not None:
+                save_response(db, response)
+            db.commit()
+            break
+        except IntegrityError:
+            # Request lain menambah baris yang sama bersamaan: ulangi sekali, kali ini jadi merge
+            db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="Keranjang sedang diubah, silakan coba lagi")
+        except Exception:
+            db.rollback()
+            raise
+
 # Endpoint: POST /cart
 class AddCartRequest(BaseModel):
     product_id: int
@@ -131,23 +251,14 @@ class AddCartRequest(BaseModel):
     quantity: int
 
 @router.post("", response_model=SimpleResponse)
-def add_to_cart(req: AddCartRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == req.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if req.quantity < 1:
-        raise HTTPException(status_code=400, detail="Quantity minimal 1")
-    # Optional: validasi tanggal
-    cart_item = Cart(
-        user_id=user.id,
-        product_id=product.id,
-        start_date=str(req.start_date),
-        end_date=str(req.end_date),
-        quantity=req.quantity
-    )
-    db.add(cart_item)
-    db.commit()
-    return {"success": True, "message": "Item berhasil ditambahkan ke keranjang"}
+def add_to_cart(req: AddCartRequest, idempotency_key: Optional[str] = Header(None), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return run_idempotent(idempotency_key, "POST /cart", req, user, db, lambda: add_cart_item(req, user, db))
+
+def add_cart_item(req: AddCartRequest, user: User, db: Session) -> dict:
+    # Produk + tanggal yang sama dengan baris yang sudah ada menambah quantity baris itu
+    result = {"success": True, "message": "Item berhasil ditambahkan ke keranjang"}
+    apply_cart_operations(user, [CartOperation(op="add", **req.model_dump())], db, response=result)
+    return result
 
 # Endpoint: PUT /cart/{cart_id}
 class UpdateCartRequest(BaseModel):
@@ -157,31 +268,80 @@ class UpdateCartRequest(BaseModel):
 
 @router.put("/{cart_id}", response_model=SimpleResponse)
 def update_cart(cart_id: int, req: UpdateCartRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cart_item = db.query(Cart).filter(Cart.id == cart_id, Cart.user_id == user.id).first()
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-    cart_item.start_date = str(req.start_date)
-    cart_item.end_date = str(req.end_date)
-    cart_item.quantity = req.quantity
-    db.commit()
+    apply_cart_operations(user, [CartOperation(op="update", cart_id=cart_id, **req.model_dump())], db)
     return {"success": True, "message": "Item keranjang berhasil diupdate"}
 
 # Endpoint: DELETE /cart/{cart_id}
 @router.delete("/{cart_id}", response_model=SimpleResponse)
 def delete_cart(cart_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cart_item = db.query(Cart).filter(Cart.id == cart_id, Cart.user_id == user.id).first()
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-    db.delete(cart_item)
-    db.commit()
+    apply_cart_operations(user, [CartOperation(op="delete", cart_id=cart_id)], db)
     return {"success": True, "message": "Item keranjang berhasil dihapus"}
 
+# Endpoint: PATCH /cart
+class BatchCartRequest(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=MAX_CART_OPERATIONS)
+
+@router.patch("", response_model=CartSummaryResponse)
+def batch_update_cart(req: BatchCartRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Banyak add/update/delete sekaligus dalam satu transaksi; gagal satu, batal semua"""
+    apply_cart_operations(user, req.operations, db)
+    items = load_cart(user, db)
+    quote = price_lines([(item.product, item.start_date, item.end_date, item.quantity) for item in items])
+    return {"success": True, "data": cart_summary(quote, [item.quantity for item in items])}
+
+# Endpoint: POST /cart/price-preview
+class PricePreviewItem(BaseModel):
+    product_id: int
+    start_date: date
+    end_date: date
+    quantity: int = Field(..., ge=1)
+
+class PricePreviewRequest(BaseModel):
+    items: List[PricePreviewItem] = Field(..., min_length=1, max_length=MAX_PREVIEW_ITEMS)
+    coupon_code: Optional[str] = None
+
+class PricePreviewLine(BaseModel):
+    product_id: int
+    days_count: int
+    quantity: int
+    subtotal: float
+    deposit_subtotal: float
+
+class PricePreviewData(BaseModel):
+    items: List[PricePreviewLine]
+    subtotal: float
+    deposit_total: float
+    discount_amount: float
+    total_amount: float
+
+class PricePreviewResponse(BaseModel):
+    success: bool
+    data: PricePreviewData
+
+@router.post("/price-preview", response_model=PricePreviewResponse)
+def price_preview(req: PricePreviewRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    product_ids = {item.product_id for item in req.items}
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids))}
+    if len(products) != len(product_ids):
+        raise HTTPException(status_code=404, detail="Product not found")
+    coupon = coupon_registry.validate(req.coupon_code, db)[0] if req.coupon_code else None
+    quote = price_lines([(products[item.product_id], item.start_date, item.end_date, item.quantity) for item in req.items], coupon)
+    lines = [
+        PricePreviewLine(product_id=item.product_id, days_count=days, quantity=item.quantity, subtotal=subtotal, deposit_subtotal=deposit)
+        for item, days, subtotal, deposit in zip(req.items, quote.days, quote.subtotals, quote.deposits)
+    ]
+    return {"success": True, "data": {
+        "items": lines,
+        "subtotal": quote.subtotal,
+        "deposit_total": quote.deposit_total,
+        "discount_amount": quote.discount_amount,
+        "total_amount": quote.total_amount,
+    }}
+
 # Endpoint: POST /cart/validate-coupon
 @router.post("/validate-coupon", response_model=ValidateCouponResponse)
 def validate_coupon(req: ValidateCouponRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    coupon = db.query(Coupon).filter(Coupon.code == req.coupon_code, Coupon.is_active == True).first()
+    coupon, message = coupon_registry.validate(req.coupon_code, db)
     if not coupon:
-        return {"success": True, "data": {"valid": False, "discount_amount": 0, "message": "Kupon tidak ditemukan atau tidak aktif"}}
-    if coupon.valid_until and coupon.valid_until < datetime.utcnow():
-        return {"success": True, "data": {"valid": False, "discount_amount": 0, "message": "Kupon sudah kadaluarsa"}}
-    return {"success": True, "data": {"valid": True, "discount_amount": coupon.discount_amount, "message": "Kupon valid"}} 
\ No newline at end of file
+        return {"success": True, "data": {"valid": False, "discount_amount": 0, "message": message}}
+    return {"success": True, "data": {"valid": True, "discount_amount": coupon.discount_amount, "message": message}}
@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Product, ProductImage
+
+# Data turunan produk yang disimpan langsung di tabel products supaya
+# halaman list (cart, favorit, dll) tidak perlu memuat semua gambar produk.
+
+# Kartu produk (data ringkas untuk list) dipakai bersama oleh semua listing.
+# Dibaca langsung dari kolom products setiap request (satu query by primary
+# key), tidak di-cache per proses: harga / rating / gambar bisa diubah proses
+# lain, dan mengecek versi entri cache butuh query yang sama.
+CARD_COLUMNS = (
+    Product.id, Product.name, Product.price_per_day, Product.original_price, Product.discount_percentage,
+    Product.rating, Product.review_count, Product.primary_image_url,
+)
+
+class ProductCard(NamedTuple):
+    id: int
+    name: str
+    price_per_day: float
+    original_price: float
+    discount_percentage: int
+    rating: float
+    review_count: int
+    image_url: str
+
+    @classmethod
+    def from_row(cls, row) -> "ProductCard":
+        """Baris dengan kolom CARD_COLUMNS (urutan sama)"""
+        return cls(*row[:7], image_url=row[7] or "")
+
+def primary_image_query():
+    """Subquery URL gambar utama produk: is_primary dulu, jika tidak ada gambar pertama"""
+    return (
+        select(ProductImage.image_url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(ProductImage.is_primary.desc(), ProductImage.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+def refresh_primary_images(db: Session, product_ids: Optional[Iterable[int]] = None):
+    """Hitung ulang Product.primary_image_url setelah gambar produk berubah (tidak commit)"""
+    query = db.query(Product)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(list(product_ids)))
+    query.update({Product.primary_image_url: func.coalesce(primary_image_query(), "")}, synchronize_session=False)
+
+def get_product_cards(product_ids: Iterable[int], db: Session) -> Dict[int, ProductCard]:
+    """Kartu produk per id dengan satu query kolom. Produk yang tidak ada dilewati"""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return {}
+    return {row[0]: ProductCard.from_row(row) for row in db.query(*CARD_COLUMNS).filter(Product.id.in_(product_ids))}
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import after_commit
+from models import Coupon
+
+# Registry kupon di memori: semua kupon (jumlahnya sedikit) dimuat sekali per
+# proses dan divalidasi tanpa query. Dimuat ulang setiap COUPON_REFRESH_INTERVAL
+# detik atau saat reload() dipanggil (mis. setelah kupon diubah). Batas pemakaian
+# tetap dijaga di DB oleh redeem() dengan UPDATE atomik.
+COUPON_REFRESH_INTERVAL = float(os.getenv("COUPON_REFRESH_INTERVAL", "60"))
+LATENCY_SAMPLES = 1000
+
+class CouponInfo(NamedTuple):
+    id: int
+    code: str
+    discount_amount: float
+    is_active: bool
+    valid_until: Optional[datetime]
+    usage_limit: Optional[int]
+    used_count: int
+
+def normalize_code(code: str) -> str:
+    return (code or "").strip().upper()
+
+class CouponRegistry:
+    def __init__(self, refresh_interval: float = COUPON_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._coupons: Dict[str, CouponInfo] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)  # detik, validasi terakhir
+        self._counts = {"valid": 0, "invalid": 0, "reloads": 0}
+
+    def reload(self, db: Session):
+        coupons = {
+            normalize_code(c.code): CouponInfo(c.id, c.code, c.discount_amount, bool(c.is_active), c.valid_until, c.usage_limit, c.used_count or 0)
+            for c in db.query(Coupon)
+        }
+        with self._lock:
+            self._coupons = coupons
+            self._loaded_at = time.monotonic()
+            self._counts["reloads"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_interval:
+            self.reload(db)
+
+    def validate(self, code: str, db: Session) -> Tuple[Optional[CouponInfo], str]:
+        """Return (kupon, pesan). Kupon None jika tidak bisa dipakai"""
+        started = time.perf_counter()
+        self._ensure_loaded(db)
+        coupon = self._coupons.get(normalize_code(code))
+        if coupon is None or not coupon.is_active:
+            result = None, "Kupon tidak ditemukan atau tidak aktif"
+        elif coupon.valid_until and coupon.valid_until < datetime.utcnow():
+            result = None, "Kupon sudah kadaluarsa"
+        elif coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit:
+            result = None, "Kupon sudah habis dipakai"
+        else:
+            result = coupon, "Kupon valid"
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            self._counts["valid" if result[0] else "invalid"] += 1
+        return result
+
+    def redeem(self, coupon: CouponInfo, db: Session) -> bool:
+        """Naikkan used_count secara atomik (tidak commit). False jika batas pemakaian sudah tercapai"""
+        query = db.query(Coupon).filter(Coupon.id == coupon.id)
+        if coupon.usage_limit is not None:
+            query = query.filter(Coupon.used_count < Coupon.usage_limit)
+        if not query.update({Coupon.used_count: Coupon.used_count + 1}, synchronize_session=False):
+            self.invalidate()
+            return False
+        after_commit(db, lambda: self._count_redemption(coupon.code))
+        return True
+
+    def _count_redemption(self, code: str):
+        key = normalize_code(code)
+        with self._lock:
+            coupon = self._coupons.get(key)
+            if coupon is not None:
+                self._coupons[key] = coupon._replace(used_count=coupon.used_count + 1)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            counts = dict(self._counts)
+            size = len(self._coupons)
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1e6, 1)
+        return {
+            "coupons": size,
+            **counts,
+            "latency_us": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99), "max": percentile(1)},
+        }
+
+coupon_registry = CouponRegistry()
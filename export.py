@@ -0,0 +1,100 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Order, OrderItem, OrderTimeline
+
+# Export order untuk akuntansi. Baris dibaca per batch (yield_per) dan langsung
+# ditulis ke output, jadi memori tetap konstan berapapun ukuran tabelnya.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "ndjson")
+
+# Nama tabel export -> kolom yang ditulis (urutan = urutan kolom CSV)
+EXPORT_TABLES = {
+    "orders": [
+        Order.id, Order.order_number, Order.user_id, Order.status, Order.address_id,
+        Order.payment_method_id, Order.coupon_id, Order.total_amount, Order.discount_amount,
+        Order.deposit_total, Order.shipping_date, Order.return_date, Order.notes, Order.created_at,
+    ],
+    "order_items": [
+        OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+        OrderItem.start_date, OrderItem.end_date, OrderItem.subtotal, OrderItem.deposit_subtotal,
+    ],
+    "order_timelines": [
+        OrderTimeline.id, OrderTimeline.order_id, OrderTimeline.status,
+        OrderTimeline.description, OrderTimeline.created_at,
+    ],
+}
+
+def _export_query(table: str, date_from: Optional[date], date_to: Optional[date], status: Optional[str]):
+    """SELECT kolom tabel, difilter berdasarkan tanggal dibuat & status order induknya"""
+    columns = EXPORT_TABLES[table]
+    model = columns[0].class_
+    stmt = select(*columns)
+    if model is not Order and (date_from or date_to or status):
+        stmt = stmt.join(Order, Order.id == model.order_id)
+    if date_from:
+        stmt = stmt.where(Order.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        stmt = stmt.where(Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    if status:
+        stmt = stmt.where(Order.status == status)
+    return stmt.order_by(model.id)
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _csv_chunk(rows: List[tuple]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([[_format_value(v) for v in row] for row in rows])
+    return buffer.getvalue()
+
+def _ndjson_chunk(header: List[str], rows: List[tuple]) -> str:
+    return "".join(
+        json.dumps({key: _format_value(v) for key, v in zip(header, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+def iter_export(table: str, fmt: str, db: Session, date_from: Optional[date] = None,
+                date_to: Optional[date] = None, status: Optional[str] = None) -> Iterator[str]:
+    """Generator potongan teks CSV/NDJSON, satu potongan per batch baris"""
+    header = [column.key for column in EXPORT_TABLES[table]]
+    if fmt == "csv":
+        yield _csv_chunk([header])
+    result = db.execute(
+        _export_query(table, date_from, date_to, status),
+        execution_options={"yield_per": EXPORT_BATCH_SIZE},
+    )
+    for rows in result.partitions():
+        yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(header, rows)
+
+def stream_export(table: str, fmt: str, date_from: Optional[date] = None,
+                  date_to: Optional[date] = None, status: Optional[str] = None) -> Iterator[str]:
+    """Seperti iter_export, tapi dengan session sendiri yang hidup selama response di-stream"""
+    db = SessionLocal()
+    try:
+        yield from iter_export(table, fmt, db, date_from, date_to, status)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export order ke CSV/NDJSON (stdout)")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--status")
+    args = parser.parse_args()
+    for chunk in stream_export(args.table, args.fmt, args.date_from, args.date_to, args.status):
+        sys.stdout.write(chunk)
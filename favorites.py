@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import FrozenSet, Iterable, List, Optional
 from datetime import datetime
 from db import SessionLocal
 from models import Favorite, Product, ProductImage, User
 from auth import get_db, security, SECRET_KEY, ALGORITHM, get_current_user
 from jose import jwt, JWTError
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.sqlite import insert
+from catalog import CARD_COLUMNS, ProductCard
+from pagination import CursorPagination, paginate_keyset
+from popularity import record_favorites, record_unfavorites
 
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
 
+MAX_BATCH_FAVORITES = 1000
+
+def get_favorite_ids(user_id: int, db: Session) -> FrozenSet[int]:
+    """Id produk favorit user untuk menandai is_favorited di listing.
+    Dibaca per request (satu query lewat index favorites(user_id, ...)), tidak
+    di-cache per proses supaya tidak basi antar worker."""
+    return frozenset(product_id for (product_id,) in db.query(Favorite.product_id).filter(Favorite.user_id == user_id))
+
 # Response Model
 class FavoriteProductItem(BaseModel):
     id: int
@@ -26,53 +39,141 @@ class FavoriteProductItem(BaseModel):
     class Config:
         from_attributes = True
 
+class FavoritesPage(BaseModel):
+    favorites: List[FavoriteProductItem]
+    pagination: CursorPagination
+
 class FavoritesResponse(BaseModel):
     success: bool
     data: List[FavoriteProductItem]
 
+class FavoritesPageResponse(BaseModel):
+    success: bool
+    data: FavoritesPage
+
 class SimpleResponse(BaseModel):
     success: bool
     message: str
 
+class FavoriteIdsResponse(BaseModel):
+    success: bool
+    data: List[int]
+
+def favorite_cards_query(user_id: int, db: Session):
+    # Kolom kartu produk langsung dari join products (harga / rating terbaru), tanpa memuat gambar
+    return (
+        db.query(Favorite.id.label("favorite_id"), Favorite.added_at, *CARD_COLUMNS)
+        .join(Product, Product.id == Favorite.product_id)
+        .filter(Favorite.user_id == user_id)
+    )
+
+def favorite_items(rows) -> List[FavoriteProductItem]:
+    return [FavoriteProductItem(**ProductCard.from_row(row[2:])._asdict(), added_at=row.added_at) for row in rows]
+
+# Endpoint: GET /favorites
 @router.get("", response_model=FavoritesResponse)
 def get_favorites(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    print("GET_FAVORITES CALLED")
-    favorites = db.query(Favorite).filter(Favorite.user_id == user.id).join(Product).options(joinedload(Favorite.product).joinedload(Product.images)).all()
-    result = []
-    for fav in favorites:
-        product = fav.product
-        image_url = product.images[0].image_url if product.images else ""
-        result.append(FavoriteProductItem(
-            id=product.id,
-            name=product.name,
-            price_per_day=product.price_per_day,
-            original_price=product.original_price,
-            discount_percentage=product.discount_percentage,
-            rating=product.rating,
-            review_count=product.review_count,
-            image_url=image_url,
-            added_at=fav.added_at
-        ))
-    return {"success": True, "data": result}
+    # Bentuk response lama (semua favorit dalam satu list), untuk client yang belum memakai /favorites/page
+    rows = favorite_cards_query(user.id, db).order_by(Favorite.added_at, Favorite.id).all()
+    return {"success": True, "data": favorite_items(rows)}
+
+# Endpoint: GET /favorites/page
+@router.get("/page", response_model=FavoritesPageResponse)
+def get_favorites_page(
+    sort: str = Query("newest", pattern="^(newest|oldest)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # Keyset pada (added_at, id) lewat index ix_favorites_user_added
+    query = favorite_cards_query(user.id, db)
+    rows, pagination = paginate_keyset(query, Favorite.added_at, Favorite.id, cursor, limit, lambda row: (row.added_at, row.favorite_id), descending=sort == "newest")
+    return {"success": True, "data": {"favorites": favorite_items(rows), "pagination": pagination}}
+
+@router.get("/ids", response_model=FavoriteIdsResponse)
+def get_favorite_product_ids(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return {"success": True, "data": sorted(get_favorite_ids(user.id, db))}
+
+# Endpoint: POST /favorites/batch
+class BatchFavoritesRequest(BaseModel):
+    add: List[int] = Field(default_factory=list, max_length=MAX_BATCH_FAVORITES)
+    remove: List[int] = Field(default_factory=list, max_length=MAX_BATCH_FAVORITES)
+    toggle: List[int] = Field(default_factory=list, max_length=MAX_BATCH_FAVORITES)
+
+class BatchFavoritesData(BaseModel):
+    added: List[int]
+    removed: List[int]
+    ids: List[int]
+
+class BatchFavoritesResponse(BaseModel):
+    success: bool
+    data: BatchFavoritesData
+
+def insert_favorites(user_id: int, product_ids: Iterable[int], db: Session) -> List[int]:
+    """INSERT ... SELECT dari products ON CONFLICT DO NOTHING: produk yang tidak ada / sudah favorit dilewati.
+    Return id produk yang benar-benar ditambahkan"""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return []
+    now = datetime.utcnow()
+    stmt = insert(Favorite).from_select(
+        [Favorite.user_id, Favorite.product_id, Favorite.added_at],
+        select(literal(user_id), Product.id, literal(now)).where(Product.id.in_(product_ids)),
+    ).on_conflict_do_nothing(index_elements=[Favorite.user_id, Favorite.product_id]).returning(Favorite.product_id)
+    added = [product_id for (product_id,) in db.execute(stmt)]
+    record_favorites(added, db, at=now)
+    return added
+
+def delete_favorites(user_id: int, product_ids: Iterable[int], db: Session) -> List[int]:
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return []
+    stmt = delete(Favorite).where(Favorite.user_id == user_id, Favorite.product_id.in_(product_ids)).returning(Favorite.product_id, Favorite.added_at)
+    rows = db.execute(stmt).all()
+    record_unfavorites(rows, db)
+    return [product_id for product_id, _ in rows]
+
+@router.post("/batch", response_model=BatchFavoritesResponse)
+def batch_favorites(req: BatchFavoritesRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Sinkronisasi daftar favorit (mis. dari mode offline) dalam satu request dan satu transaksi"""
+    to_add, to_remove, to_toggle = set(req.add), set(req.remove), set(req.toggle)
+    if to_add & to_remove or to_toggle & (to_add | to_remove):
+        # Urutan antar-list tidak didefinisikan, jadi id yang sama di dua list ditolak
+        raise HTTPException(status_code=400, detail="Produk yang sama tidak boleh ada di lebih dari satu list (add, remove, toggle)")
+    if to_toggle:
+        # Status favorit saat ini dibaca langsung dari tabel (satu SELECT)
+        current = {
+            product_id
+            for (product_id,) in db.query(Favorite.product_id).filter(Favorite.user_id == user.id, Favorite.product_id.in_(to_toggle))
+        }
+        to_remove |= current
+        to_add |= to_toggle - current
+    user_id = user.id  # user ter-expire setelah commit
+    removed = delete_favorites(user_id, to_remove, db)
+    added = insert_favorites(user_id, to_add, db)
+    db.commit()
+    return {"success": True, "data": {
+        "added": sorted(added),
+        "removed": sorted(removed),
+        "ids": sorted(get_favorite_ids(user_id, db)),
+    }}
 
 @router.post("/{product_id}", response_model=SimpleResponse)
 def add_favorite(product_id: int = Path(..., ge=1), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    existing = db.query(Favorite).filter(Favorite.user_id == user.id, Favorite.product_id == product_id).first()
-    if existing:
+    added = insert_favorites(user.id, [product_id], db)
+    if not added:
+        # Jalur gagal saja yang butuh query tambahan untuk membedakan penyebabnya
+        if not db.query(Product.id).filter(Product.id == product_id).first():
+            raise HTTPException(status_code=404, detail="Product not found")
         raise HTTPException(status_code=400, detail="Product already in favorites")
-    fav = Favorite(user_id=user.id, product_id=product_id)
-    db.add(fav)
     db.commit()
     return {"success": True, "message": "Product added to favorites"}
 
 @router.delete("/{product_id}", response_model=SimpleResponse)
 def remove_favorite(product_id: int = Path(..., ge=1), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    fav = db.query(Favorite).filter(Favorite.user_id == user.id, Favorite.product_id == product_id).first()
-    if not fav:
+    removed = delete_favorites(user.id, [product_id], db)
+    if not removed:
         raise HTTPException(status_code=404, detail="Favorite not found")
-    db.delete(fav)
     db.commit()
-    return {"success": True, "message": "Product removed from favorites"} 
\ No newline at end of file
+    return {"success": True, "message": "Product removed from favorites"}
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import List
 from db import SessionLocal
 from models import Banner, Category, Product
+from catalog import get_product_cards
 
 router = APIRouter(prefix="/home", tags=["Home/Beranda"])
 
@@ -85,18 +86,14 @@ def get_recommendations_beginner(limit: int = Query(10, ge=1, le=50), db=Depends
 # Endpoint: /home/recommendations/popular
 @router.get("/recommendations/popular", response_model=ProductRecommendationResponse)
 def get_recommendations_popular(limit: int = Query(10, ge=1, le=50), db=Depends(get_db)):
-    products = db.query(Product).order_by(Product.rating.desc()).limit(limit).all()
-    return {"success": True, "data": [ProductRecommendationItem(
-        id=p.id,
-        name=p.name,
-        price_per_day=p.price_per_day,
-        original_price=p.original_price,
-        discount_percentage=p.discount_percentage,
-        rating=p.rating,
-        review_count=p.review_count,
-        image_url=p.images[0].image_url if p.images else "",
-        is_favorited=False
-    ) for p in products]}
+    # Urutan dari index ix_products_popularity, data produk dari kolom kartu
+    product_ids = [product_id for (product_id,) in db.query(Product.id).order_by(Product.popularity_score.desc(), Product.id.desc()).limit(limit)]
+    cards = get_product_cards(product_ids, db)
+    return {"success": True, "data": [
+        ProductRecommendationItem(**cards[product_id]._asdict(), is_favorited=False)
+        for product_id in product_ids
+        if product_id in cards
+    ]}
 
 # Enable ORM mode for Pydantic models
 BannerItem.Config = type('Config', (), {'orm_mode': True})
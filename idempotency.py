@@ -0,0 +1,121 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import after_commit
+from models import IdempotencyKey, User
+
+# Client mengirim header Idempotency-Key; request ulang dengan key yang sama
+# mendapat response yang tersimpan tanpa menjalankan ulang endpoint.
+# Handler yang punya efek samping memanggil save_response(db, result) tepat
+# sebelum commit-nya, jadi response tersimpan di transaksi yang sama: jika
+# proses mati sebelum commit, keduanya batal dan request ulang aman dijalankan.
+IDEMPOTENCY_TTL = timedelta(hours=24)
+# Key "processing" lebih tua dari ini dianggap sisa proses yang mati
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(seconds=60)
+# Duplikat yang datang bersamaan menunggu request pertama selesai sampai batas ini
+IDEMPOTENCY_WAIT = 5.0  # detik
+IDEMPOTENCY_POLL_INTERVAL = 0.1  # detik
+MAX_KEY_LENGTH = 255
+
+# Helper
+
+def request_fingerprint(endpoint: str, req: BaseModel) -> str:
+    body = json.dumps(jsonable_encoder(req), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{endpoint}\n{body}".encode()).hexdigest()
+
+def _replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.response_status,
+        content=json.loads(record.response_body),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+def _acquire(user: User, key: str, fingerprint: str, db: Session) -> Tuple[bool, Optional[IdempotencyKey]]:
+    """Coba klaim key (INSERT unik = lock). Return (berhasil, record milik request lain jika key sudah ada)"""
+    now = datetime.utcnow()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < now).delete(synchronize_session=False)
+        db.add(IdempotencyKey(user_id=user.id, key=key, fingerprint=fingerprint, status="processing", created_at=now, expires_at=now + IDEMPOTENCY_TTL))
+        db.commit()
+        return True, None
+    except IntegrityError:
+        db.rollback()
+        return False, db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user.id, IdempotencyKey.key == key).first()
+
+def _key_filter(user_id: int, key: str):
+    return (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+def _complete(user_id: int, key: str, result: dict, db: Session):
+    db.query(IdempotencyKey).filter(*_key_filter(user_id, key)).update({
+        IdempotencyKey.status: "completed",
+        IdempotencyKey.response_status: status.HTTP_200_OK,
+        IdempotencyKey.response_body: json.dumps(jsonable_encoder(result)),
+    }, synchronize_session=False)
+
+def save_response(db: Session, result: dict):
+    """Tandai key idempotency yang sedang diproses sebagai selesai di transaksi db
+    (tanpa commit). Tidak melakukan apa-apa jika request tidak membawa key"""
+    claim = db.info.get("idempotency_claim")
+    if claim is None:
+        return
+    _complete(*claim, result, db)
+    after_commit(db, lambda: db.info.__setitem__("idempotency_saved", True))
+
+def run_idempotent(key: Optional[str], endpoint: str, req: BaseModel, user: User, db: Session, handler: Callable[[], dict]):
+    """Jalankan handler sekali per (user, Idempotency-Key); request ulang mendapat response tersimpan"""
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key terlalu panjang")
+    fingerprint = request_fingerprint(endpoint, req)
+    user_id = user.id  # user ter-expire setelah commit/rollback
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        acquired, existing = _acquire(user, key, fingerprint, db)
+        if acquired:
+            break
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Idempotency-Key sudah dipakai untuk request yang berbeda")
+            if existing.status == "completed":
+                return _replay(existing)
+            if existing.created_at < datetime.utcnow() - IDEMPOTENCY_LOCK_TIMEOUT:
+                # Request pertama mati sebelum selesai (efek sampingnya ikut batal): ambil alih key
+                db.delete(existing)
+                db.commit()
+                continue
+        # existing None: key baru saja dilepas request lain; tunggu sebentar lalu klaim lagi
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Request dengan Idempotency-Key ini masih diproses")
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+    db.info["idempotency_claim"] = (user_id, key)
+    db.info.pop("idempotency_saved", None)
+    try:
+        result = handler()
+    except Exception:
+        # Gagal: lepas key supaya client boleh mencoba lagi dengan key yang sama,
+        # kecuali response-nya sudah ter-commit bersama efek sampingnya
+        db.rollback()
+        db.query(IdempotencyKey).filter(*_key_filter(user_id, key), IdempotencyKey.status == "processing").delete(synchronize_session=False)
+        db.commit()
+        raise
+    finally:
+        db.info.pop("idempotency_claim", None)
+
+    if not db.info.pop("idempotency_saved", False):
+        # Handler tanpa efek samping yang tidak memanggil save_response
+        _complete(user_id, key, result, db)
+        db.commit()
+    return result
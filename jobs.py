@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import signal
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# Antrian job persisten di tabel jobs. Job di-enqueue di transaksi yang sama
+# dengan perubahan datanya, jadi ikut hilang jika transaksi rollback dan tetap
+# ada walau server restart. Worker mengambil job yang jatuh tempo per batch
+# dengan lease; job yang lease-nya habis (worker mati) diambil ulang.
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER_ENABLED", "1") == "1"
+JOB_BATCH_SIZE = 500
+JOB_POLL_INTERVAL = 1.0  # detik
+JOB_LEASE = timedelta(seconds=60)
+JOB_RETRY_BACKOFF = timedelta(seconds=5)
+
+# kind -> handler(payloads, db). Handler memproses satu batch sekaligus dan tidak commit;
+# commit dilakukan bersama penghapusan job supaya efek dan status job selalu konsisten.
+JobHandler = Callable[[List[dict], Session], None]
+_handlers: Dict[str, JobHandler] = {}
+
+_stop_event = threading.Event()
+_worker_thread: Optional[threading.Thread] = None
+
+def job_handler(kind: str):
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+def enqueue(kind: str, payload: dict, db: Session, delay: Optional[timedelta] = None) -> Job:
+    """Tambah job ke session (belum commit), dijalankan setelah delay"""
+    job = Job(kind=kind, payload=json.dumps(payload), status="pending", run_at=datetime.utcnow() + (delay or timedelta(0)))
+    db.add(job)
+    return job
+
+def claim_jobs(db: Session, batch_size: int = JOB_BATCH_SIZE) -> List[Job]:
+    """Ambil sampai batch_size job jatuh tempo dengan satu UPDATE atomik (lease)"""
+    now = datetime.utcnow()
+    owner = uuid.uuid4().hex
+    due = (
+        select(Job.id)
+        .where(or_(
+            and_(Job.status == "pending", Job.run_at <= now),
+            and_(Job.status == "running", Job.locked_until < now),
+        ))
+        .order_by(Job.run_at)
+        .limit(batch_size)
+    )
+    db.query(Job).filter(Job.id.in_(due)).update({
+        Job.status: "running",
+        Job.lease_owner: owner,
+        Job.locked_until: now + JOB_LEASE,
+        Job.attempts: Job.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    return db.query(Job).filter(Job.lease_owner == owner, Job.status == "running").order_by(Job.run_at).all()
+
+def _reschedule(job: Job, error: str, db: Session):
+    job.lease_owner = None
+    job.locked_until = None
+    job.last_error = error
+    if job.attempts >= job.max_attempts:
+        job.status = "failed"
+        logger.error(f"Job {job.id} ({job.kind}) failed permanently: {error}")
+    else:
+        job.status = "pending"
+        job.run_at = datetime.utcnow() + JOB_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+    db.commit()
+
+def _run_batch(handler: JobHandler, jobs: List[Job], db: Session):
+    handler([json.loads(job.payload or "{}") for job in jobs], db)
+    # Job selesai langsung dihapus supaya tabel tetap kecil
+    db.query(Job).filter(Job.id.in_([job.id for job in jobs])).delete(synchronize_session=False)
+    db.commit()
+
+def run_due_jobs(db: Session, batch_size: int = JOB_BATCH_SIZE) -> int:
+    """Proses satu batch job jatuh tempo, dikelompokkan per kind. Return jumlah job yang diambil"""
+    jobs = claim_jobs(db, batch_size)
+    by_kind = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+
+    for kind, batch in by_kind.items():
+        handler = _handlers.get(kind)
+        if handler is None:
+            for job in batch:
+                _reschedule(job, f"Tidak ada handler untuk job '{kind}'", db)
+            continue
+        try:
+            _run_batch(handler, batch, db)
+        except Exception:
+            db.rollback()
+            # Batch gagal: ulangi satu per satu supaya hanya job yang bermasalah yang di-retry
+            for job in batch:
+                try:
+                    _run_batch(handler, [job], db)
+                except Exception as e:
+                    db.rollback()
+                    _reschedule(job, str(e), db)
+    return len(jobs)
+
+def _worker_loop():
+    while not _stop_event.is_set():
+        db = SessionLocal()
+        try:
+            processed = run_due_jobs(db)
+        except Exception:
+            logger.exception("Job worker error")
+            processed = 0
+        finally:
+            db.close()
+        if processed < JOB_BATCH_SIZE:
+            _stop_event.wait(JOB_POLL_INTERVAL)
+
+def start_worker():
+    global _worker_thread
+    if _worker_thread is not None and _worker_thread.is_alive():
+        return
+    _stop_event.clear()
+    _worker_thread = threading.Thread(target=_worker_loop, name="job-worker", daemon=True)
+    _worker_thread.start()
+
+def stop_worker():
+    _stop_event.set()
+    if _worker_thread is not None:
+        _worker_thread.join(timeout=5)
+
+def run_worker():
+    """Jalankan worker di thread ini sampai Ctrl+C / SIGTERM (proses worker terpisah, lihat worker.py)"""
+    signal.signal(signal.SIGTERM, lambda *_: _stop_event.set())
+    _stop_event.clear()
+    logger.info("Job worker started")
+    try:
+        _worker_loop()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _stop_event.set()
+        logger.info("Job worker stopped")
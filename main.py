@@ -1,5 +1,5 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from auth import router as auth_router
 from db import Base, engine
@@ -14,8 +14,23 @@ from payment_methods import router as payment_methods_router
 from orders import router as orders_router
 from reviews import router as reviews_router
 from profile import router as profile_router
+from admin import router as admin_router
+from uploads import UploadFiles
+from jobs import JOB_WORKER_ENABLED, start_worker, stop_worker
 
-app = FastAPI(title="CampToGo Webservice")
+# Worker job queue ikut jalan di proses API kecuali JOB_WORKER_ENABLED=0.
+# Dengan beberapa worker uvicorn, set JOB_WORKER_ENABLED=0 di proses API dan
+# jalankan satu worker terpisah: python worker.py
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if JOB_WORKER_ENABLED:
+        start_worker()
+    try:
+        yield
+    finally:
+        stop_worker()
+
+app = FastAPI(title="CampToGo Webservice", lifespan=lifespan)
 
 # Konfigurasi CORS
 app.add_middleware(
@@ -30,8 +45,8 @@ app.add_middleware(
 # Inisialisasi DB (buat tabel jika belum ada)
 Base.metadata.create_all(bind=engine)
 
-# Mount static files directory to serve uploaded images
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount static files directory to serve uploaded images (cache header, ETag, Range)
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
 
 app.include_router(auth_router)
 app.include_router(home_router)
@@ -43,4 +58,5 @@ app.include_router(addresses_router)
 app.include_router(payment_methods_router)
 app.include_router(orders_router)
 app.include_router(reviews_router)
-app.include_router(profile_router) 
\ No newline at end of file
+app.include_router(profile_router)
+app.include_router(admin_router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean, Index, CheckConstraint
 from sqlalchemy.orm import relationship
 from db import Base
 from datetime import datetime
@@ -43,11 +43,22 @@ class Product(Base):
     rating = Column(Float, nullable=False, default=0)
     review_count = Column(Integer, nullable=False, default=0)
     stock_quantity = Column(Integer, nullable=False, default=0)
+    reservation_version = Column(Integer, nullable=False, default=0)  # optimistic lock untuk booking stok
+    primary_image_url = Column(String, nullable=False, default="")  # turunan product_images, lihat catalog.py
+    # Counter popularitas, lihat popularity.py
+    favorite_count = Column(Integer, nullable=False, default=0)
+    rental_count = Column(Integer, nullable=False, default=0)  # POPULARITY_WINDOW_DAYS terakhir
+    rental_days = Column(Integer, nullable=False, default=0)  # unit-hari, POPULARITY_WINDOW_DAYS terakhir
+    popularity_score = Column(Float, nullable=False, default=0)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     category = relationship("Category", back_populates="products")
     images = relationship("ProductImage", back_populates="product")
     reviews = relationship("ProductReview", back_populates="product")
 
+    __table_args__ = (
+        Index("ix_products_popularity", "popularity_score", "id"),
+    )
+
 class ProductImage(Base):
     __tablename__ = "product_images"
     id = Column(Integer, primary_key=True, index=True)
@@ -82,6 +93,11 @@ class Favorite(Base):
     user = relationship("User")
     product = relationship("Product")
 
+    __table_args__ = (
+        Index("ix_favorites_user_product", "user_id", "product_id", unique=True),
+        Index("ix_favorites_user_added", "user_id", "added_at", "id"),
+    )
+
 class Cart(Base):
     __tablename__ = "carts"
     id = Column(Integer, primary_key=True, index=True)
@@ -96,6 +112,10 @@ class Cart(Base):
     user = relationship("User")
     product = relationship("Product")
 
+    __table_args__ = (
+        Index("ix_carts_user_product_dates", "user_id", "product_id", "start_date", "end_date", unique=True),
+    )
+
 class Address(Base):
     __tablename__ = "addresses"
     id = Column(Integer, primary_key=True, index=True)
@@ -117,6 +137,8 @@ class Coupon(Base):
     is_active = Column(Boolean, default=True)
     valid_until = Column(DateTime, nullable=True)
     description = Column(String, default="")
+    usage_limit = Column(Integer, nullable=True)  # None = tanpa batas
+    used_count = Column(Integer, nullable=False, default=0)
 
 class PaymentMethod(Base):
     __tablename__ = "payment_methods"
@@ -141,6 +163,7 @@ class Order(Base):
     coupon_id = Column(Integer, ForeignKey("coupons.id"), nullable=True)
     order_number = Column(String, unique=True, nullable=False)
     status = Column(String, nullable=False, default="pending")
+    version = Column(Integer, nullable=False, default=0)  # naik setiap status berpindah (validasi cache detail)
     notes = Column(Text, default="")
     total_amount = Column(Float, nullable=False, default=0)
     discount_amount = Column(Float, nullable=False, default=0)
@@ -154,12 +177,16 @@ class Order(Base):
     payment_method = relationship("PaymentMethod")
     coupon = relationship("Coupon")
     items = relationship("OrderItem", back_populates="order")
-    timeline = relationship("OrderTimeline", back_populates="order")
+    timeline = relationship("OrderTimeline", back_populates="order", order_by="OrderTimeline.created_at")
+
+    __table_args__ = (
+        Index("ix_orders_user_created", "user_id", "created_at", "id"),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     start_date = Column(String, nullable=False)  # YYYY-MM-DD
@@ -170,6 +197,50 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
 
+class ReservationDay(Base):
+    __tablename__ = "reservation_days"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    day = Column(String, nullable=False)  # YYYY-MM-DD
+    reserved = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_reservation_days_product_day", "product_id", "day", unique=True),
+        CheckConstraint("reserved >= 0", name="ck_reservation_days_reserved_nonnegative"),
+    )
+
+class ProductSimilarity(Base):
+    # Top-K produk serupa per produk, dibangun oleh similarity.py
+    __tablename__ = "product_similarities"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), unique=True, index=True, nullable=False)
+    neighbors = Column(Text, nullable=False, default="[]")  # JSON [[product_id, skor], ...] urut dari paling mirip
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyStats(Base):
+    # Rollup harian, di-update saat order dibuat / dikembalikan (lihat analytics.py)
+    __tablename__ = "daily_stats"
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(String, unique=True, index=True, nullable=False)  # YYYY-MM-DD
+    order_count = Column(Integer, nullable=False, default=0)
+    # Uang dalam sen (lihat pricing.to_cents)
+    revenue_cents = Column(Integer, nullable=False, default=0)      # subtotal sewa - diskon, tanpa deposit
+    deposit_in_cents = Column(Integer, nullable=False, default=0)   # deposit diterima dari order baru
+    deposit_out_cents = Column(Integer, nullable=False, default=0)  # deposit dikembalikan saat barang kembali
+
+class ProductDailyStats(Base):
+    # Rollup per produk per hari sewa (lihat analytics.py)
+    __tablename__ = "product_daily_stats"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    day = Column(String, nullable=False)  # YYYY-MM-DD
+    units_on_rent = Column(Integer, nullable=False, default=0)
+    revenue_cents = Column(Integer, nullable=False, default=0)  # subtotal item (sen) dibagi rata per hari sewa
+
+    __table_args__ = (
+        Index("ix_product_daily_stats_day_product", "day", "product_id", unique=True),
+    )
+
 class OrderTimeline(Base):
     __tablename__ = "order_timelines"
     id = Column(Integer, primary_key=True, index=True)
@@ -186,4 +257,61 @@ class BlacklistedToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String, unique=True, index=True)
     blacklisted_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime) 
\ No newline at end of file
+    expires_at = Column(DateTime) 
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, default="{}")  # JSON string
+    status = Column(String, nullable=False, default="pending")  # pending, running, failed
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    lease_owner = Column(String, nullable=True, index=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+class PopularityState(Base):
+    # Satu baris (id=1): epoch skor popularitas saat ini (lihat popularity.py)
+    __tablename__ = "popularity_state"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    epoch = Column(DateTime, nullable=False)
+
+class OrderWorkerLease(Base):
+    # Id worker untuk nomor order per proses (lihat order_numbers.py)
+    __tablename__ = "order_worker_leases"
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)  # 0-999
+    owner = Column(String, nullable=False)  # uuid proses pemegang lease
+    heartbeat_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)  # sha256 endpoint + body request
+    status = Column(String, nullable=False, default="processing")  # processing, completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON string
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_key", "user_id", "key", unique=True),
+    )
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String, unique=True, index=True, nullable=False)
+    extension = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)  # upload terakhir dengan isi ini (dedup), untuk masa tenggang GC
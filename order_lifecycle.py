@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from analytics import record_returns
+from availability import release
+from cache import LRUCache
+from jobs import job_handler
+from models import Order, OrderItem, OrderTimeline
+
+# Tabel transisi status order: status asal -> status tujuan yang diizinkan
+TRANSITIONS: Dict[str, tuple] = {
+    "pending": ("ongoing",),
+    "ongoing": ("returned",),
+    "returned": (),
+}
+
+# Deskripsi default timeline untuk tiap status tujuan
+TIMELINE_DESCRIPTIONS = {
+    "pending": "Pesanan dibuat",
+    "ongoing": "Pesanan dikonfirmasi dan sedang diproses",
+    "returned": "Barang dikembalikan oleh user",
+}
+
+# Cache detail order (GET /orders/{id}): {order_id: (version, data)}.
+# Detail order hanya berubah lewat transisi status, yang menaikkan orders.version.
+# Setiap baca tetap mengecek version di DB (satu query by primary key), jadi entri
+# dari proses lain / yang ditulis dari data lama tidak pernah dipakai.
+order_detail_cache = LRUCache(int(os.getenv("ORDER_DETAIL_CACHE_SIZE", "1024")))
+
+def can_transition(from_status: str, to_status: str) -> bool:
+    return to_status in TRANSITIONS.get(from_status, ())
+
+def source_statuses(to_status: str) -> List[str]:
+    return [from_status for from_status, targets in TRANSITIONS.items() if to_status in targets]
+
+def transition_orders(order_ids: Iterable[int], to_status: str, db: Session, description: Optional[str] = None) -> List[int]:
+    """Pindahkan banyak order sekaligus: satu UPDATE ... RETURNING + bulk insert timeline (tidak commit).
+
+    Order yang statusnya tidak boleh pindah ke to_status dilewati.
+    Return id order yang benar-benar berpindah status.
+    """
+    order_ids = list(set(order_ids))
+    from_statuses = source_statuses(to_status)
+    if not order_ids or not from_statuses:
+        return []
+    # Cek status dan pindah dalam satu statement: jika dua transaksi memindahkan order yang
+    # sama, hanya yang pertama mendapat id-nya kembali, jadi timeline / release tidak dobel
+    stmt = (
+        update(Order)
+        .where(Order.id.in_(order_ids), Order.status.in_(from_statuses))
+        .values(status=to_status, version=Order.version + 1)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    moved = [oid for (oid,) in db.execute(stmt)]
+    if not moved:
+        return []
+    now = datetime.utcnow()
+    db.execute(insert(OrderTimeline), [
+        {"order_id": oid, "status": to_status, "description": description or TIMELINE_DESCRIPTIONS[to_status], "created_at": now}
+        for oid in moved
+    ])
+    if to_status == "returned":
+        # Barang kembali: bebaskan stok di index ketersediaan
+        release(db.query(OrderItem).filter(OrderItem.order_id.in_(moved)).all(), db)
+        record_returns(moved, db, returned_at=now)
+    return moved
+
+# Job: konfirmasi order (pending -> ongoing) setelah delay checkout
+@job_handler("order.confirm")
+def confirm_orders(payloads: List[dict], db: Session):
+    transition_orders([p["order_id"] for p in payloads], "ongoing", db)
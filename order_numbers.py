@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from cache import after_commit
+from models import OrderWorkerLease
+
+# Nomor order: ORD + waktu UTC sampai milidetik + id worker + sequence
+#   ORD 20261019134502123 042 007  ->  "ORD20261019134502123042007"
+# Lebar tetap, jadi urutan string = urutan waktu dibuat. Unik selama setiap
+# proses punya id worker berbeda (0-999); sequence menampung 1000 order per
+# milidetik per worker sebelum menunggu milidetik berikutnya.
+#
+# Id worker diambil dari ORDER_WORKER_ID jika di-set (satu proses per nilai),
+# selain itu di-lease dari tabel order_worker_leases: tiap proses mengklaim id
+# yang bebas / lease-nya habis dan memperbaruinya selama masih membuat order.
+# Kolom orders.order_number tetap unik sebagai pengaman terakhir (lihat
+# orders.checkout yang mengulang dengan id worker baru jika bentrok).
+WORKER_ID_MAX = 1000
+SEQUENCE_MAX = 1000
+WORKER_LEASE = timedelta(hours=1)
+WORKER_LEASE_RENEW_INTERVAL = WORKER_LEASE.total_seconds() / 4  # detik
+
+_env_worker_id = os.getenv("ORDER_WORKER_ID")
+FIXED_WORKER_ID: Optional[int] = int(_env_worker_id) % WORKER_ID_MAX if _env_worker_id else None
+
+class WorkerIdLease:
+    def __init__(self):
+        self.owner = uuid.uuid4().hex
+        self.worker_id: Optional[int] = None
+        self._renewed_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, db: Session) -> int:
+        """Id worker proses ini; klaim / perpanjang lease di transaksi db (ikut commit pemanggil)"""
+        with self._lock:
+            if self.worker_id is not None and time.monotonic() - self._renewed_at < WORKER_LEASE_RENEW_INTERVAL:
+                return self.worker_id
+            if self.worker_id is None or not self._renew(db):
+                self.worker_id = self._claim(db)
+            # Lease baru dianggap sah setelah transaksinya commit; jika rollback,
+            # pemakaian berikutnya memperpanjang / mengklaim ulang
+            after_commit(db, self._mark_renewed)
+            return self.worker_id
+
+    def _mark_renewed(self):
+        with self._lock:
+            self._renewed_at = time.monotonic()
+
+    def reset(self):
+        """Lupakan id sekarang (misal setelah nomor order bentrok), klaim ulang di pemakaian berikutnya"""
+        with self._lock:
+            self.worker_id = None
+            self._renewed_at = 0.0
+
+    def _renew(self, db: Session) -> bool:
+        return bool(
+            db.query(OrderWorkerLease)
+            .filter(OrderWorkerLease.worker_id == self.worker_id, OrderWorkerLease.owner == self.owner)
+            .update({OrderWorkerLease.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        )
+
+    def _claim(self, db: Session) -> int:
+        now = datetime.utcnow()
+        cutoff = now - WORKER_LEASE
+        leases = dict(db.query(OrderWorkerLease.worker_id, OrderWorkerLease.heartbeat_at))
+        for worker_id in range(WORKER_ID_MAX):
+            heartbeat_at = leases.get(worker_id)
+            if heartbeat_at is None:
+                # ON CONFLICT DO NOTHING: jika diklaim proses lain barusan, tidak ada baris yang kembali
+                claimed = db.execute(
+                    insert(OrderWorkerLease)
+                    .values(worker_id=worker_id, owner=self.owner, heartbeat_at=now)
+                    .on_conflict_do_nothing()
+                    .returning(OrderWorkerLease.worker_id)
+                ).scalar()
+                if claimed is not None:
+                    return worker_id
+            elif heartbeat_at < cutoff:
+                # Ambil alih lease yang habis hanya jika belum diambil proses lain (compare-and-set)
+                taken = (
+                    db.query(OrderWorkerLease)
+                    .filter(OrderWorkerLease.worker_id == worker_id, OrderWorkerLease.heartbeat_at == heartbeat_at)
+                    .update({OrderWorkerLease.owner: self.owner, OrderWorkerLease.heartbeat_at: now}, synchronize_session=False)
+                )
+                if taken:
+                    return worker_id
+        raise RuntimeError(f"Semua {WORKER_ID_MAX} id worker nomor order sedang dipakai")
+
+worker_lease = WorkerIdLease()
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+def _next_id():
+    global _last_ms, _sequence
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        # Jam mundur (NTP) tidak boleh menghasilkan nomor yang lebih kecil
+        now_ms = max(now_ms, _last_ms)
+        if now_ms == _last_ms:
+            _sequence += 1
+            if _sequence >= SEQUENCE_MAX:
+                while now_ms <= _last_ms:
+                    time.sleep(0.0001)
+                    now_ms = time.time_ns() // 1_000_000
+                _sequence = 0
+        else:
+            _sequence = 0
+        _last_ms = now_ms
+        return now_ms, _sequence
+
+def generate_order_number(db: Session) -> str:
+    worker_id = FIXED_WORKER_ID if FIXED_WORKER_ID is not None else worker_lease.current(db)
+    now_ms, sequence = _next_id()
+    timestamp = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc)
+    return f"ORD{timestamp:%Y%m%d%H%M%S}{now_ms % 1000:03d}{worker_id:03d}{sequence:03d}"
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, Header
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError, OperationalError
 from typing import List, Optional
-from datetime import datetime
-from models import Order, OrderItem, OrderTimeline, Cart, Product, Address, PaymentMethod, Coupon, User
+from datetime import datetime, timedelta
+from models import Order, OrderItem, OrderTimeline, Cart, Product, Address, PaymentMethod, User
 from auth import get_db, get_current_user
+from db import is_database_locked
+from availability import ensure_available, book, read_versions, claim_versions, ReservationConflict
+from jobs import enqueue
+from analytics import record_order
+from popularity import record_rentals
+from pricing import price_lines
+from coupons import coupon_registry
+from idempotency import run_idempotent, save_response
+from pagination import paginate_desc
+from order_numbers import generate_order_number, worker_lease
+from order_lifecycle import TIMELINE_DESCRIPTIONS, can_transition, transition_orders, order_detail_cache
 from pydantic import BaseModel
-import random, string
-import asyncio
+import random
 import logging
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +28,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+# Checkout diulang jika reservasi stok bentrok dengan checkout lain
+CHECKOUT_MAX_ATTEMPTS = 3
+CHECKOUT_RETRY_BACKOFF = 0.05  # detik
+
+ORDER_CONFIRM_DELAY = timedelta(seconds=30)
+
 # Response Models
 class OrderItemProduct(BaseModel):
     id: int
@@ -101,132 +120,137 @@ class SimpleResponse(BaseModel):
 
 # Helper
 
-def generate_order_number():
-    return 'ORD' + datetime.utcnow().strftime('%Y%m%d%H%M%S') + ''.join(random.choices(string.digits, k=4))
-
 def get_cart_for_order(user: User, db: Session):
-    return db.query(Cart).filter(Cart.user_id == user.id).all()
+    return db.query(Cart).filter(Cart.user_id == user.id).options(joinedload(Cart.product)).all()
 
-def calc_order_totals(cart_items, coupon: Optional[Coupon]):
-    subtotal = 0
-    deposit_total = 0
-    for item in cart_items:
-        product = item.product
-        days_count = (datetime.strptime(item.end_date, "%Y-%m-%d") - datetime.strptime(item.start_date, "%Y-%m-%d")).days + 1
-        subtotal += product.price_per_day * days_count * item.quantity
-        deposit_total += product.deposit_amount * item.quantity
-    discount_amount = coupon.discount_amount if coupon else 0
-    total_amount = max(subtotal + deposit_total - discount_amount, 0)
-    return subtotal, deposit_total, discount_amount, total_amount
-
-async def update_order_status_after_delay(order_id: int, db: Session):
-    # Tunggu 30 detik
-    await asyncio.sleep(30)
-    
-    # Ambil order dan update status
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if order and order.status == "pending":
-        order.status = "ongoing"
-        timeline = OrderTimeline(
-            order_id=order.id,
-            status="ongoing",
-            description="Pesanan dikonfirmasi dan sedang diproses",
-            created_at=datetime.utcnow()
-        )
-        db.add(timeline)
-        db.commit()
-
-# Endpoint: POST /orders
-@router.post("", response_model=CreateOrderResponse)
-def create_order(req: CreateOrderRequest, background_tasks: BackgroundTasks, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def place_order(req: CreateOrderRequest, user: User, db: Session) -> Order:
     cart_items = get_cart_for_order(user, db)
     if not cart_items:
         raise HTTPException(status_code=400, detail="Keranjang kosong")
+    versions = read_versions([item.product_id for item in cart_items], db)
+    ensure_available([(item.product, item.start_date, item.end_date, item.quantity) for item in cart_items], db)
     address = db.query(Address).filter(Address.id == req.address_id, Address.user_id == user.id).first()
     if not address:
         raise HTTPException(status_code=404, detail="Alamat tidak ditemukan")
     payment_method = db.query(PaymentMethod).filter(PaymentMethod.id == req.payment_method_id, PaymentMethod.user_id == user.id).first()
     if not payment_method:
         raise HTTPException(status_code=404, detail="Metode pembayaran tidak ditemukan")
-    coupon = None
-    if req.coupon_code:
-        coupon = db.query(Coupon).filter(Coupon.code == req.coupon_code, Coupon.is_active == True).first()
-        if not coupon or (coupon.valid_until and coupon.valid_until < datetime.utcnow()):
-            coupon = None
-    subtotal, deposit_total, discount_amount, total_amount = calc_order_totals(cart_items, coupon)
-    order_number = generate_order_number()
+    coupon = coupon_registry.validate(req.coupon_code, db)[0] if req.coupon_code else None
+    if coupon and not coupon_registry.redeem(coupon, db):
+        # Kuota kupon habis direbut checkout lain
+        coupon = None
+    quote = price_lines([(item.product, item.start_date, item.end_date, item.quantity) for item in cart_items], coupon)
     order = Order(
         user_id=user.id,
         address_id=address.id,
         payment_method_id=payment_method.id,
         coupon_id=coupon.id if coupon else None,
-        order_number=order_number,
         status="pending",
         notes=req.notes or "",
-        total_amount=total_amount,
-        discount_amount=discount_amount,
-        deposit_total=deposit_total,
+        total_amount=quote.total_amount,
+        discount_amount=quote.discount_amount,
+        deposit_total=quote.deposit_total,
         shipping_date=cart_items[0].start_date if cart_items else None,
         return_date=cart_items[0].end_date if cart_items else None
     )
+    # Nomor bentrok (id worker dipakai proses lain) gagal di flush ini; checkout() mengulang seluruh percobaan
+    order.order_number = generate_order_number(db)
     db.add(order)
-    db.commit()
-    db.refresh(order)
-    # Simpan order items
-    for item in cart_items:
-        product = item.product
-        days_count = (datetime.strptime(item.end_date, "%Y-%m-%d") - datetime.strptime(item.start_date, "%Y-%m-%d")).days + 1
-        subtotal_item = product.price_per_day * days_count * item.quantity
-        deposit_item = product.deposit_amount * item.quantity
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            quantity=item.quantity,
-            start_date=item.start_date,
-            end_date=item.end_date,
-            subtotal=subtotal_item,
-            deposit_subtotal=deposit_item
-        )
-        db.add(order_item)
-    # Timeline
-    timeline = OrderTimeline(
+    db.flush()
+    # Simpan order items + timeline dengan bulk insert
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": order.id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "start_date": item.start_date,
+            "end_date": item.end_date,
+            "subtotal": line_subtotal,
+            "deposit_subtotal": line_deposit
+        }
+        for item, line_subtotal, line_deposit in zip(cart_items, quote.subtotals, quote.deposits)
+    ])
+    db.add(OrderTimeline(
         order_id=order.id,
         status="pending",
-        description="Pesanan dibuat",
+        description=TIMELINE_DESCRIPTIONS["pending"],
         created_at=datetime.utcnow()
-    )
-    db.add(timeline)
-    # Hapus cart
-    for item in cart_items:
-        db.delete(item)
-    db.commit()
-    
-    # Tambahkan background task untuk update status setelah 30 detik
-    background_tasks.add_task(update_order_status_after_delay, order.id, db)
-    
-    return {"success": True, "message": "Pesanan berhasil dibuat", "data": {"order_id": order.id, "order_number": order.order_number, "total_amount": order.total_amount}}
+    ))
+    book(cart_items, db)
+    rental_rows = [(item.product_id, item.quantity, item.start_date, item.end_date, line_subtotal) for item, line_subtotal in zip(cart_items, quote.subtotals)]
+    record_order(order, rental_rows, db)
+    record_rentals(rental_rows, db, at=order.created_at)
+    # Status otomatis jadi ongoing lewat job queue (tetap jalan walau server restart)
+    enqueue("order.confirm", {"order_id": order.id}, db, delay=ORDER_CONFIRM_DELAY)
+    # Hapus cart dengan satu DELETE
+    db.query(Cart).filter(Cart.user_id == user.id, Cart.id.in_([item.id for item in cart_items])).delete(synchronize_session=False)
+    # Gagal jika ada checkout lain untuk produk yang sama yang commit duluan
+    claim_versions(versions, db)
+    return order
+
+# Endpoint: POST /orders
+@router.post("", response_model=CreateOrderResponse)
+def create_order(req: CreateOrderRequest, idempotency_key: Optional[str] = Header(None), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Retry dari client dengan Idempotency-Key yang sama mendapat hasil checkout pertama
+    return run_idempotent(idempotency_key, "POST /orders", req, user, db, lambda: checkout(req, user, db))
+
+def checkout(req: CreateOrderRequest, user: User, db: Session) -> dict:
+    user_id = user.id
+    for attempt in range(CHECKOUT_MAX_ATTEMPTS):
+        try:
+            order = place_order(req, user, db)
+            result = {"success": True, "message": "Pesanan berhasil dibuat", "data": {"order_id": order.id, "order_number": order.order_number, "total_amount": order.total_amount}}
+            # Response Idempotency-Key ikut commit bersama order
+            save_response(db, result)
+            db.commit()
+            break
+        except (ReservationConflict, OperationalError, IntegrityError) as e:
+            # Hanya konflik reservasi / database terkunci / nomor order bentrok yang diulang; error DB lain tetap 500
+            if isinstance(e, OperationalError) and not is_database_locked(e):
+                raise
+            if isinstance(e, IntegrityError):
+                if "order_number" not in str(e.orig):
+                    raise
+                # Klaim id worker baru supaya nomor berikutnya tidak bentrok lagi
+                worker_lease.reset()
+            db.rollback()
+            last_error = e
+            logger.info(f"Checkout conflict for user_id={user_id} (attempt {attempt + 1}): {e}")
+            time.sleep(random.uniform(0, CHECKOUT_RETRY_BACKOFF * (attempt + 1)))
+    else:
+        if isinstance(last_error, ReservationConflict):
+            raise HTTPException(status_code=409, detail="Stok sedang dipesan pengguna lain, silakan coba lagi")
+        if isinstance(last_error, IntegrityError):
+            raise HTTPException(status_code=503, detail="Gagal membuat nomor pesanan, silakan coba lagi")
+        raise HTTPException(status_code=503, detail="Server sedang sibuk, silakan coba lagi")
+    return result
 
 # Endpoint: GET /orders
 @router.get("", response_model=OrderListResponse)
-def get_orders(status: Optional[str] = Query(None), page: int = Query(1, ge=1), limit: int = Query(10, ge=1, le=100), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    query = db.query(Order).filter(Order.user_id == user.id)
+def get_orders(status: Optional[str] = Query(None), cursor: Optional[str] = Query(None), page: Optional[int] = Query(None, ge=1, deprecated=True), limit: int = Query(10, ge=1, le=100), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # ?page= (OFFSET) tetap diterima untuk client lama; client baru memakai next_cursor
+    if cursor and page:
+        raise HTTPException(status_code=400, detail="Gunakan cursor atau page, tidak keduanya")
+    # Jumlah item dihitung di query yang sama (subquery per baris, pakai index order_id)
+    item_count = select(func.count(OrderItem.id)).where(OrderItem.order_id == Order.id).scalar_subquery()
+    query = db.query(Order, item_count).filter(Order.user_id == user.id)
     if status:
         query = query.filter(Order.status == status)
-    total_items = query.count()
-    orders = query.order_by(Order.created_at.desc()).offset((page-1)*limit).limit(limit).all()
+    offset = (page - 1) * limit if page else 0
+    rows, pagination = paginate_desc(query, Order.created_at, Order.id, cursor, limit, lambda row: (row[0].created_at, row[0].id), offset=offset)
     result = []
-    for o in orders:
+    for o, count in rows:
         result.append(OrderListItem(
             id=o.id,
             order_number=o.order_number,
             status=o.status,
             total_amount=o.total_amount,
-            item_count=len(o.items),
+            item_count=count,
             created_at=o.created_at,
             shipping_date=o.shipping_date,
             return_date=o.return_date
         ))
-    return {"success": True, "data": {"orders": result}}
+    return {"success": True, "data": {"orders": result, "pagination": pagination}}
 
 # Endpoint: GET /orders/{order_id}
 @router.get("/{order_id}", response_model=OrderDetailResponse)
@@ -234,70 +258,73 @@ def get_order_detail(order_id: int, user: User = Depends(get_current_user), db:
     try:
         # Log request
         logger.info(f"Fetching order detail for order_id: {order_id}, user_id: {user.id}")
-        
-        # Get order with basic relations first
-        order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
+
+        cached = order_detail_cache.get(order_id)
+        if cached is not None:
+            # Cek kepemilikan + version sekaligus; cache hanya dipakai jika version-nya sama
+            version = db.query(Order.version).filter(Order.id == order_id, Order.user_id == user.id).scalar()
+            if version is not None and version == cached[0]:
+                return {"success": True, "data": cached[1]}
+
+        # Jumlah query tetap: order+alamat, items+produk, gambar produk, timeline
+        order = (
+            db.query(Order)
+            .options(
+                joinedload(Order.address),
+                selectinload(Order.items).joinedload(OrderItem.product).selectinload(Product.images),
+                selectinload(Order.timeline),
+            )
+            .filter(Order.id == order_id, Order.user_id == user.id)
+            .first()
+        )
         if not order:
             logger.warning(f"Order not found: order_id={order_id}, user_id={user.id}")
             raise HTTPException(status_code=404, detail="Order tidak ditemukan")
-            
-        # Load relations separately to better handle errors
-        try:
-            items = []
-            for item in order.items:
-                try:
-                    product = item.product
-                    image_url = product.images[0].image_url if product.images else ""
-                    items.append(OrderItemDetail(
-                        product=OrderItemProduct(id=product.id, name=product.name, image_url=image_url),
-                        quantity=item.quantity,
-                        start_date=item.start_date,
-                        end_date=item.end_date,
-                        subtotal=item.subtotal,
-                        deposit_subtotal=item.deposit_subtotal
-                    ))
-                except Exception as e:
-                    logger.error(f"Error processing order item: {str(e)}")
-                    raise HTTPException(status_code=500, detail="Error memproses item pesanan")
-            
-            if not order.address:
-                logger.error(f"Address not found for order: {order_id}")
-                raise HTTPException(status_code=500, detail="Alamat tidak ditemukan")
-                
-            address = order.address
-            payment_summary = PaymentSummary(
-                subtotal=sum(i.subtotal for i in order.items),
+
+        if not order.address:
+            logger.error(f"Address not found for order: {order_id}")
+            raise HTTPException(status_code=500, detail="Alamat tidak ditemukan")
+
+        items = []
+        subtotal = 0
+        for item in order.items:
+            product = item.product
+            image_url = product.images[0].image_url if product.images else ""
+            items.append(OrderItemDetail(
+                product=OrderItemProduct(id=product.id, name=product.name, image_url=image_url),
+                quantity=item.quantity,
+                start_date=item.start_date,
+                end_date=item.end_date,
+                subtotal=item.subtotal,
+                deposit_subtotal=item.deposit_subtotal
+            ))
+            subtotal += item.subtotal
+
+        address = order.address
+        data = OrderDetailResponseData(
+            id=order.id,
+            order_number=order.order_number,
+            status=order.status,
+            items=items,
+            address=OrderAddress(
+                recipient_name=address.recipient_name,
+                full_address=address.full_address,
+                phone_number=address.phone_number
+            ),
+            payment_summary=PaymentSummary(
+                subtotal=subtotal,
                 deposit_total=order.deposit_total,
                 discount_amount=order.discount_amount,
                 total_amount=order.total_amount
-            )
-            
-            timeline = [TimelineItem(status=t.status, description=t.description, created_at=t.created_at) 
-                       for t in order.timeline]
-            
-            data = OrderDetailResponseData(
-                id=order.id,
-                order_number=order.order_number,
-                status=order.status,
-                items=items,
-                address=OrderAddress(
-                    recipient_name=address.recipient_name,
-                    full_address=address.full_address,
-                    phone_number=address.phone_number
-                ),
-                payment_summary=payment_summary,
-                timeline=timeline
-            )
-            
-            logger.info(f"Successfully fetched order detail for order_id: {order_id}")
-            return {"success": True, "data": data}
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Error processing order detail: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error memproses detail pesanan: {str(e)}")
-            
+            ),
+            timeline=[TimelineItem(status=t.status, description=t.description, created_at=t.created_at) for t in order.timeline]
+        )
+        # Version dibaca bersama data: entri dari data lama tidak akan lolos cek version di atas
+        order_detail_cache.set(order_id, (order.version, data))
+
+        logger.info(f"Successfully fetched order detail for order_id: {order_id}")
+        return {"success": True, "data": data}
+
     except HTTPException:
         raise
     except Exception as e:
@@ -310,15 +337,8 @@ def return_order(order_id: int, user: User = Depends(get_current_user), db: Sess
     order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order tidak ditemukan")
-    if order.status != "ongoing":
+    if not can_transition(order.status, "returned"):
         raise HTTPException(status_code=400, detail="Order tidak dalam status ongoing")
-    order.status = "returned"
-    timeline = OrderTimeline(
-        order_id=order.id,
-        status="returned",
-        description="Barang dikembalikan oleh user",
-        created_at=datetime.utcnow()
-    )
-    db.add(timeline)
+    transition_orders([order.id], "returned", db)
     db.commit()
     return {"success": True, "message": "Pengembalian barang berhasil dikonfirmasi"} 
\ No newline at end of file
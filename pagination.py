@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+
+# Keyset pagination untuk list yang diurutkan (waktu, id), DESC atau ASC.
+# Cursor = posisi baris terakhir di halaman sebelumnya, di-encode base64
+# supaya opaque bagi client. Latensi tetap walau user punya ribuan baris.
+
+class CursorPagination(BaseModel):
+    limit: int
+    has_next: bool
+    next_cursor: Optional[str] = None
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor tidak valid")
+
+def paginate_keyset(query, sort_column, id_column, cursor: Optional[str], limit: int, cursor_of: Callable[[Any], Tuple[datetime, int]], descending: bool = True, offset: int = 0):
+    """Ambil satu halaman (sort_column, id_column) setelah cursor, DESC atau ASC.
+
+    cursor_of(row) mengembalikan (nilai sort, id) sebuah baris. Return (rows, CursorPagination).
+    offset hanya untuk endpoint lama yang masih menerima ?page=.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id)))
+    order_by = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+    rows = query.order_by(*order_by).offset(offset).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*cursor_of(rows[-1])) if has_next else None
+    return rows, CursorPagination(limit=limit, has_next=has_next, next_cursor=next_cursor)
+
+def paginate_desc(query, sort_column, id_column, cursor: Optional[str], limit: int, cursor_of: Callable[[Any], Tuple[datetime, int]], offset: int = 0):
+    """Ambil satu halaman (sort_column DESC, id_column DESC) setelah cursor"""
+    return paginate_keyset(query, sort_column, id_column, cursor, limit, cursor_of, offset=offset)
@@ -0,0 +1,187 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from analytics import RentalRow
+from availability import days_between, parse_date
+from db import SessionLocal
+from jobs import enqueue, job_handler
+from models import Favorite, Job, Order, OrderItem, PopularityState, Product
+
+# Counter popularitas per produk disimpan di tabel products dan ditambah di
+# transaksi yang sama dengan favorit / order, jadi sort "popular" cukup baca
+# index ix_products_popularity.
+#
+# popularity_score = jumlah bobot event * 2^((waktu event - epoch) / half-life).
+# Event lama tidak perlu dikurangi: bobot event baru selalu lebih besar, jadi
+# urutan skor sama dengan urutan skor yang meluruh terhadap waktu sekarang.
+# Supaya faktor tidak terus membesar (overflow / presisi hilang), epoch disimpan
+# di popularity_state dan dimajukan kelipatan half-life setelah
+# POPULARITY_RESCALE_AFTER_HALF_LIVES; semua skor dibagi 2^k di transaksi yang
+# sama (pembagian dengan pangkat dua, jadi tidak ada pembulatan tambahan).
+# rental_count / rental_days hanya menghitung POPULARITY_WINDOW_DAYS terakhir:
+# job popularity.expire mengurangi kembali setelah jendela lewat.
+# Data lama diisi dengan: python popularity.py
+POPULARITY_EPOCH = datetime(2026, 1, 1)  # epoch awal jika popularity_state masih kosong
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "14"))
+POPULARITY_RESCALE_AFTER_HALF_LIVES = 16  # faktor bobot maksimal ~2^16 sebelum epoch dimajukan
+POPULARITY_WINDOW_DAYS = 30
+FAVORITE_WEIGHT = 1.0
+RENTAL_WEIGHT = 3.0
+RENTAL_DAY_WEIGHT = 0.5  # per unit-hari sewa
+UPDATE_CHUNK_SIZE = 500
+
+Deltas = Dict[int, Dict[str, float]]
+
+# Helper
+
+def decay_factor(at: datetime, epoch: datetime) -> float:
+    return 2 ** ((at - epoch).total_seconds() / (POPULARITY_HALF_LIFE_DAYS * 86400))
+
+def _lock_epoch(db: Session) -> datetime:
+    """Epoch saat ini. Dibaca lewat UPDATE ... RETURNING supaya baris popularity_state
+    terkunci sampai transaksi selesai: rescale dari proses lain tidak bisa menyelip
+    di antara menghitung bobot dan menambahkannya ke skor"""
+    stmt = update(PopularityState).where(PopularityState.id == 1).values(epoch=PopularityState.epoch).returning(PopularityState.epoch)
+    epoch = db.execute(stmt).scalar()
+    if epoch is None:
+        db.execute(insert(PopularityState).values(id=1, epoch=POPULARITY_EPOCH).on_conflict_do_nothing())
+        epoch = db.execute(stmt).scalar()
+    return epoch
+
+def current_epoch(db: Session, now: Optional[datetime] = None) -> datetime:
+    """Epoch untuk menghitung bobot di transaksi ini; majukan dulu jika faktornya sudah terlalu besar"""
+    epoch = _lock_epoch(db)
+    half_life = timedelta(days=POPULARITY_HALF_LIFE_DAYS)
+    half_lives = int(((now or datetime.utcnow()) - epoch) / half_life)
+    if half_lives >= POPULARITY_RESCALE_AFTER_HALF_LIVES:
+        epoch += half_life * half_lives
+        # Dibagi bertahap (maks 2^1000 per langkah) supaya faktornya sendiri tidak underflow
+        scaled = Product.popularity_score
+        for done in range(0, half_lives, 1000):
+            scaled = scaled * 2.0 ** -min(half_lives - done, 1000)
+        db.query(Product).update({Product.popularity_score: scaled}, synchronize_session=False)
+        db.query(PopularityState).filter(PopularityState.id == 1).update({PopularityState.epoch: epoch}, synchronize_session=False)
+    return epoch
+
+def _bump(deltas: Deltas, db: Session):
+    """Tambah counter banyak produk sekaligus: satu UPDATE ... CASE id per chunk"""
+    product_ids = list(deltas)
+    for i in range(0, len(product_ids), UPDATE_CHUNK_SIZE):
+        chunk = product_ids[i:i + UPDATE_CHUNK_SIZE]
+        values = {}
+        for name, cast in (("favorite_count", int), ("rental_count", int), ("rental_days", int), ("popularity_score", float)):
+            column = getattr(Product, name)
+            per_product = {product_id: cast(deltas[product_id][name]) for product_id in chunk if deltas[product_id].get(name)}
+            if per_product:
+                values[column] = column + case(per_product, value=Product.id, else_=0)
+        if values:
+            db.query(Product).filter(Product.id.in_(chunk)).update(values, synchronize_session=False)
+
+def _rental_deltas(rows: Iterable[RentalRow], at: datetime, epoch: datetime) -> Deltas:
+    factor = decay_factor(at, epoch)
+    deltas = defaultdict(lambda: defaultdict(float))
+    for product_id, quantity, start_date, end_date, *_ in rows:
+        unit_days = days_between(parse_date(start_date), parse_date(end_date)) * quantity
+        delta = deltas[product_id]
+        delta["rental_count"] += 1
+        delta["rental_days"] += unit_days
+        delta["popularity_score"] += (RENTAL_WEIGHT + RENTAL_DAY_WEIGHT * unit_days) * factor
+    return deltas
+
+def _enqueue_expiry(deltas: Deltas, at: datetime, db: Session):
+    payload = {"rows": [[product_id, int(d["rental_count"]), int(d["rental_days"])] for product_id, d in deltas.items()]}
+    delay = at + timedelta(days=POPULARITY_WINDOW_DAYS) - datetime.utcnow()
+    enqueue("popularity.expire", payload, db, delay=max(delay, timedelta(0)))
+
+# Update counter (dipanggil tanpa commit, ikut transaksi pemanggil)
+
+def record_favorites(product_ids: Iterable[int], db: Session, at: Optional[datetime] = None):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    factor = decay_factor(at or datetime.utcnow(), current_epoch(db))
+    _bump({product_id: {"favorite_count": 1, "popularity_score": FAVORITE_WEIGHT * factor} for product_id in product_ids}, db)
+
+def record_unfavorites(rows: Iterable[Tuple[int, Optional[datetime]]], db: Session):
+    """rows: (product_id, added_at) favorit yang dihapus; bobotnya dikurangi persis seperti saat ditambahkan"""
+    rows = list(rows)
+    if not rows:
+        return
+    epoch = current_epoch(db)
+    deltas = defaultdict(lambda: defaultdict(float))
+    for product_id, added_at in rows:
+        deltas[product_id]["favorite_count"] -= 1
+        deltas[product_id]["popularity_score"] -= FAVORITE_WEIGHT * decay_factor(added_at or datetime.utcnow(), epoch)
+    _bump(deltas, db)
+
+def record_rentals(rows: List[RentalRow], db: Session, at: Optional[datetime] = None):
+    """Order baru: tambah rental_count, rental_days dan skor, lalu jadwalkan pengurangan setelah jendela lewat"""
+    at = at or datetime.utcnow()
+    if not rows:
+        return
+    deltas = _rental_deltas(rows, at, current_epoch(db))
+    _bump(deltas, db)
+    _enqueue_expiry(deltas, at, db)
+
+# Job: keluarkan sewa yang sudah lewat POPULARITY_WINDOW_DAYS dari counter
+@job_handler("popularity.expire")
+def expire_rentals(payloads: List[dict], db: Session):
+    deltas = defaultdict(lambda: defaultdict(float))
+    for payload in payloads:
+        for product_id, rental_count, rental_days in payload["rows"]:
+            deltas[product_id]["rental_count"] -= rental_count
+            deltas[product_id]["rental_days"] -= rental_days
+    _bump(deltas, db)
+
+def rebuild(db: Session):
+    """Hitung ulang semua counter dari tabel favorites dan orders (untuk data lama / perbaikan)"""
+    db.query(Job).filter(Job.kind == "popularity.expire", Job.status.in_(["pending", "running"])).delete(synchronize_session=False)
+    # Semua skor dihitung ulang, jadi epoch bisa langsung dipindah ke sekarang
+    _lock_epoch(db)
+    epoch = datetime.utcnow()
+    db.query(PopularityState).filter(PopularityState.id == 1).update({PopularityState.epoch: epoch}, synchronize_session=False)
+    db.query(Product).update({
+        Product.favorite_count: 0,
+        Product.rental_count: 0,
+        Product.rental_days: 0,
+        Product.popularity_score: 0,
+    }, synchronize_session=False)
+    deltas = defaultdict(lambda: defaultdict(float))
+    for product_id, added_at in db.query(Favorite.product_id, Favorite.added_at):
+        deltas[product_id]["favorite_count"] += 1
+        deltas[product_id]["popularity_score"] += FAVORITE_WEIGHT * decay_factor(added_at or datetime.utcnow(), epoch)
+    window_start = datetime.utcnow() - timedelta(days=POPULARITY_WINDOW_DAYS)
+    items = (
+        db.query(Order.id, Order.created_at, OrderItem.product_id, OrderItem.quantity, OrderItem.start_date, OrderItem.end_date)
+        .join(Order, Order.id == OrderItem.order_id)
+        .order_by(Order.id)
+    )
+    orders = defaultdict(list)
+    for order_id, created_at, *row in items:
+        orders[(order_id, created_at or datetime.utcnow())].append(row)
+    for (_, created_at), rows in orders.items():
+        order_deltas = _rental_deltas(rows, created_at, epoch)
+        if created_at < window_start:
+            # Di luar jendela: hanya menyumbang skor
+            order_deltas = {product_id: {"popularity_score": d["popularity_score"]} for product_id, d in order_deltas.items()}
+        else:
+            _enqueue_expiry(order_deltas, created_at, db)
+        for product_id, delta in order_deltas.items():
+            for name, value in delta.items():
+                deltas[product_id][name] += value
+    _bump(deltas, db)
+    db.commit()
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print("Counter popularitas selesai dihitung ulang.")
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import List, NamedTuple, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from models import Product
+
+# Satu-satunya tempat hitung harga sewa (cart, checkout, preview harga).
+# Semua uang dihitung dalam sen (integer) supaya tidak ada selisih pembulatan
+# float; hasil dikonversi balik ke float hanya untuk response/kolom DB.
+
+# (product, start_date, end_date, quantity) - tanggal str YYYY-MM-DD atau date.
+# Kupon cukup punya atribut discount_amount (Coupon / coupons.CouponInfo).
+PriceInput = Tuple[Product, object, object, int]
+
+class Quote(NamedTuple):
+    days: List[int]
+    subtotals: List[float]
+    deposits: List[float]
+    subtotal: float
+    deposit_total: float
+    discount_amount: float
+    total_amount: float
+
+# Helper
+
+def to_cents(amount) -> int:
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+@lru_cache(maxsize=4096)
+def _ordinal(value: str) -> int:
+    return date.fromisoformat(value).toordinal()
+
+def to_ordinal(value) -> int:
+    return value.toordinal() if isinstance(value, date) else _ordinal(value)
+
+def price_lines(lines: Sequence[PriceInput], coupon=None) -> Quote:
+    """Hitung subtotal, deposit per baris dan total seluruh keranjang dalam satu pass"""
+    if not lines:
+        return Quote([], [], [], 0, 0, 0, 0)
+    products, starts, ends, quantities = zip(*lines)
+    days = [to_ordinal(e) - to_ordinal(s) + 1 for s, e in zip(starts, ends)]
+    if min(days) < 1:
+        raise HTTPException(status_code=400, detail="Tanggal selesai tidak boleh sebelum tanggal mulai")
+    # Harga per produk cukup dikonversi sekali walau produk muncul di banyak baris
+    rates = {p.id: (to_cents(p.price_per_day), to_cents(p.deposit_amount)) for p in products}
+    subtotals = [rates[p.id][0] * d * q for p, d, q in zip(products, days, quantities)]
+    deposits = [rates[p.id][1] * q for p, q in zip(products, quantities)]
+    subtotal = sum(subtotals)
+    deposit_total = sum(deposits)
+    discount = to_cents(coupon.discount_amount) if coupon else 0
+    total = max(subtotal + deposit_total - discount, 0)
+    return Quote(
+        days=days,
+        subtotals=[from_cents(c) for c in subtotals],
+        deposits=[from_cents(c) for c in deposits],
+        subtotal=from_cents(subtotal),
+        deposit_total=from_cents(deposit_total),
+        discount_amount=from_cents(discount),
+        total_amount=from_cents(total),
+    )
+
+if __name__ == "__main__":
+    # Micro-benchmark: python pricing.py
+    import random
+    import timeit
+    products = [Product(id=i, price_per_day=random.randint(100, 5000) * 100 + 0.5, deposit_amount=random.randint(1, 50) * 10000) for i in range(50)]
+    for size in (1, 10, 100, 500):
+        lines = []
+        for _ in range(size):
+            start = random.randint(1, 20)
+            lines.append((random.choice(products), f"2031-05-{start:02d}", f"2031-05-{start + random.randint(0, 8):02d}", random.randint(1, 3)))
+        runs = max(10000 // size, 10)
+        elapsed = timeit.timeit(lambda: price_lines(lines), number=runs)
+        print(f"{size:4d} baris: {elapsed / runs * 1e6:9.1f} us/keranjang")
@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Query, Path, Depends, HTTPException, status
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, FrozenSet
+from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, asc, func
 import json
 
 from db import SessionLocal
-from models import Product, Category, ProductImage, ProductReview, Favorite, User
+from models import Product, Category, ProductImage, ProductReview, User
 from auth import get_current_user
+from availability import free_per_day, iter_days
+from favorites import get_favorite_ids
+from catalog import get_product_cards
+from similarity import get_similar_ids
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
@@ -108,6 +112,19 @@ class SimilarProductsResponse(BaseModel):
     success: bool
     data: List[ProductItem]
 
+class AvailabilityDay(BaseModel):
+    date: date
+    available: int
+
+class ProductAvailabilityData(BaseModel):
+    product_id: int
+    stock_quantity: int
+    days: List[AvailabilityDay]
+
+class ProductAvailabilityResponse(BaseModel):
+    success: bool
+    data: ProductAvailabilityData
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -117,14 +134,9 @@ def get_db():
         db.close()
 
 # Helper function to map ORM Product to ProductItem Pydantic model
-def map_product_to_product_item(product: Product, user: Optional[User] = None) -> ProductItem:
-    # Cek status favorit jika user ada
-    is_favorited = False
-    if user:
-        is_favorited = db.query(Favorite).filter(
-            Favorite.user_id == user.id,
-            Favorite.product_id == product.id
-        ).first() is not None
+def map_product_to_product_item(product: Product, favorite_ids: FrozenSet[int] = frozenset()) -> ProductItem:
+    # Status favorit dicek dari set id favorit user (tanpa query per produk)
+    is_favorited = product.id in favorite_ids
 
     return ProductItem(
         id=product.id,
@@ -170,8 +182,8 @@ def get_products(
     elif sort_by == "rating":
         query = query.order_by(desc(Product.rating))
     elif sort_by == "popular":
-        # Assuming 'popular' means high review count or rating for now
-        query = query.order_by(desc(Product.review_count), desc(Product.rating))
+        # Skor favorit + sewa yang meluruh terhadap waktu (popularity.py), lewat index ix_products_popularity
+        query = query.order_by(desc(Product.popularity_score), desc(Product.id))
 
     # Pagination
     total_items = query.count()
@@ -179,7 +191,8 @@ def get_products(
     offset = (page - 1) * limit
     products = query.offset(offset).limit(limit).all()
 
-    product_items = [map_product_to_product_item(p, user) for p in products]
+    favorite_ids = get_favorite_ids(user.id, db) if user else frozenset()
+    product_items = [map_product_to_product_item(p, favorite_ids) for p in products]
 
     pagination = Pagination(
         current_page=page,
@@ -207,12 +220,7 @@ def get_product_detail(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
     # Cek status favorit
-    is_favorited = False
-    if user:
-        is_favorited = db.query(Favorite).filter(
-            Favorite.user_id == user.id,
-            Favorite.product_id == product.id
-        ).first() is not None
+    is_favorited = product.id in get_favorite_ids(user.id, db) if user else False
 
     data = ProductDetailData(
         id=product.id,
@@ -301,22 +309,52 @@ def get_similar_products(
     db: Session = Depends(get_db),
     user: Optional[User] = Depends(get_current_user)
 ):
-    # Find the category of the current product
+    # Tetangga terdekat dari index similarity.py (satu lookup), data produk dari kolom kartu (catalog.py)
+    similar_ids = get_similar_ids(product_id, db, limit)
+    if similar_ids is None:
+        # Index belum dibangun untuk produk ini: produk lain di kategori yang sama
+        product = db.query(Product.category_id).filter(Product.id == product_id).first()
+        if not product:
+            return {"success": True, "data": []}
+        similar_ids = [
+            other for (other,) in db.query(Product.id)
+            .filter(Product.category_id == product.category_id, Product.id != product_id)
+            .order_by(desc(Product.popularity_score), desc(Product.id))
+            .limit(limit)
+        ]
+
+    cards = get_product_cards(similar_ids, db)
+    favorite_ids = get_favorite_ids(user.id, db) if user else frozenset()
+    similar_products = [
+        ProductItem(**cards[other]._asdict(), is_favorited=other in favorite_ids)
+        for other in similar_ids
+        if other in cards
+    ]
+
+    return {"success": True, "data": similar_products}
+
+# Endpoint: GET /products/{product_id}/availability
+MAX_AVAILABILITY_DAYS = 366
+
+@router.get("/{product_id}/availability", response_model=ProductAvailabilityResponse)
+def get_product_availability(
+    product_id: int = Path(..., ge=1),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
     product = db.query(Product).filter(Product.id == product_id).first()
-
     if not product:
-        # If product not found, maybe return empty list or 404? Let's return empty for similar.
-        return {"success": True, "data": []}
-
-    # Find products in the same category, excluding the current product
-    similar_products = (
-        db.query(Product).options(joinedload(Product.images))
-        .filter(Product.category_id == product.category_id)
-        .filter(Product.id != product_id)
-        .limit(limit)
-        .all()
-    )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    from_date = from_date or date.today()
+    to_date = to_date or from_date + timedelta(days=30)
+    if to_date < from_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parameter 'to' tidak boleh sebelum 'from'")
+    if (to_date - from_date).days + 1 > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Rentang maksimal {MAX_AVAILABILITY_DAYS} hari")
 
-    similar_products = [map_product_to_product_item(p, user) for p in similar_products]
+    free = free_per_day(product, from_date, to_date, db)
+    days = [AvailabilityDay(date=day, available=count) for day, count in zip(iter_days(from_date, to_date), free)]
 
-    return {"success": True, "data": similar_products} 
\ No newline at end of file
+    return {"success": True, "data": {"product_id": product.id, "stock_quantity": product.stock_quantity, "days": days}}
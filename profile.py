@@ -5,8 +5,8 @@ from datetime import date, datetime
 from models import User
 from auth import get_db, get_current_user, verify_password, get_password_hash
 from pydantic import BaseModel, EmailStr
-import shutil # For file upload
 import os # For file path anjay
+from storage import store_upload, blob_url, retain, release
 
 router = APIRouter(prefix="/profile", tags=["User Profile"])
 
@@ -68,11 +68,6 @@ def update_profile(req: UpdateProfileRequest, user: User = Depends(get_current_u
     return {"success": True, "message": "Profil berhasil diupdate"}
 
 # Endpoint: POST /profile/upload-photo
-# Set upload directory
-UPLOAD_DIRECTORY = "./uploads"
-if not os.path.exists(UPLOAD_DIRECTORY):
-    os.makedirs(UPLOAD_DIRECTORY)
-
 @router.post("/upload-photo", response_model=SimpleResponse)
 async def upload_profile_photo(file: UploadFile = File(...), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     # Validate file type and size if needed
@@ -80,16 +75,13 @@ async def upload_profile_photo(file: UploadFile = File(...), user: User = Depend
     if file_extension not in [".jpg", ".jpeg", ".png"]:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Format file tidak diizinkan. Gunakan JPG, JPEG, atau PNG.")
 
-    # Generate unique filename
-    filename = f"{user.id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Update user profile picture URL (use relative path or a base URL)
-    user.profile_picture = f"/uploads/{filename}" # Example URL, adjust as needed
+    # Simpan ke blob store (nama file = hash isi, otomatis dedup)
+    blob = store_upload(file, file_extension, db)
+    new_url = blob_url(blob)
+    if user.profile_picture != new_url:
+        retain(blob)
+        release(user.profile_picture, db)
+        user.profile_picture = new_url
     db.commit()
     db.refresh(user)
 
@@ -5,15 +5,12 @@ from datetime import datetime
 from models import ProductReview, Product, Order, OrderItem, User
 from auth import get_db, get_current_user
 from pydantic import BaseModel
-import json, os, shutil
+import json, os
 from sqlalchemy import func
+from storage import store_upload, blob_url, retain
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
-UPLOAD_REVIEW_DIR = "./uploads/review_images"
-if not os.path.exists(UPLOAD_REVIEW_DIR):
-    os.makedirs(UPLOAD_REVIEW_DIR)
-
 class SimpleResponse(BaseModel):
     success: bool
     message: str
@@ -60,11 +57,9 @@ async def add_review(
             file_extension = os.path.splitext(file.filename)[1].lower()
             if file_extension not in [".jpg", ".jpeg", ".png"]:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Format file tidak diizinkan. Gunakan JPG, JPEG, atau PNG.")
-            filename = f"{user.id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}_{file.filename}"
-            file_path = os.path.join(UPLOAD_REVIEW_DIR, filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            image_urls.append(f"/uploads/review_images/{filename}")
+            blob = store_upload(file, file_extension, db)
+            retain(blob)
+            image_urls.append(blob_url(blob))
 
     # Create new review
     new_review = ProductReview(
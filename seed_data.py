@@ -2,6 +2,8 @@ from db import SessionLocal
 from models import (User, Banner, Category, Product, ProductImage, ProductReview, Favorite, Cart, Address, Coupon, PaymentMethod, Order, OrderItem, OrderTimeline)
 from datetime import datetime, timedelta
 from auth import get_password_hash
+from catalog import refresh_primary_images
+import similarity
 import random, json
 
 # Base URL untuk gambar
@@ -600,7 +602,10 @@ def seed():
         db.add_all(products)
         db.commit()
         db.add_all(product_images)
+        db.flush()
+        refresh_primary_images(db)
         db.commit()
+        similarity.rebuild(db)
         db.add_all(coupons)
         db.commit()
         db.add_all(addresses)
@@ -0,0 +1,276 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from jobs import enqueue, job_handler
+from models import Job, Product, ProductSimilarity
+
+# Index produk serupa: untuk tiap produk disimpan TOP_K tetangga terdekat
+# (satu baris product_similarities per produk), jadi GET /products/{id}/similar
+# cukup satu lookup by key. Dibangun di memori dari nama/deskripsi (TF-IDF),
+# kategori dan rentang harga - katalog kecil, tidak perlu library tambahan.
+# Bangun ulang semua: python similarity.py
+#
+# Produk yang dibuat / diubah / dihapus lewat ORM otomatis di-enqueue sebagai
+# job similarity.refresh (lihat _queue_refresh). Worker menyimpan index TF-IDF
+# di memori: refresh hanya menghitung vektor produk yang berubah memakai IDF
+# yang sudah ada, lalu memperbarui daftar tetangga kandidatnya. IDF produk lain
+# tidak dihitung ulang; index di memori dibangun ulang penuh setelah
+# SIMILARITY_INDEX_TTL (dan python similarity.py menyelaraskan semuanya).
+TOP_K = 20
+NAME_WEIGHT = 2  # token nama dihitung 2x token deskripsi
+TEXT_WEIGHT = 0.6
+CATEGORY_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+PRICE_BAND_RATIO = 1.5  # harga dalam rasio 1.5x dianggap satu band
+PRICE_BANDS_APART = 3   # beda >= 3 band = tidak mirip sama sekali dari sisi harga
+MIN_TOKEN_LENGTH = 2
+STOPWORDS = frozenset("dan atau untuk dengan yang di ke dari ini itu ada juga dalam pada bisa sangat lebih the and for with".split())
+SIMILARITY_INDEX_TTL = float(os.getenv("SIMILARITY_INDEX_TTL", "3600"))  # detik
+# Kolom yang memengaruhi skor; perubahan kolom lain (rating, stok, counter) tidak memicu refresh
+SIMILARITY_COLUMNS = ("name", "description", "category_id", "price_per_day")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+class ProductFeatures(NamedTuple):
+    id: int
+    category_id: int
+    price_band: int
+    vector: Dict[str, float]  # TF-IDF ternormalisasi L2
+
+# Helper
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) >= MIN_TOKEN_LENGTH and t not in STOPWORDS]
+
+def price_band(price: float) -> int:
+    return int(math.floor(math.log(max(price or 0, 1), PRICE_BAND_RATIO)))
+
+def term_counts(name: str, description: str) -> Counter:
+    terms = Counter(tokenize(description))
+    for token in tokenize(name):
+        terms[token] += NAME_WEIGHT
+    return terms
+
+def similarity(a: ProductFeatures, b: ProductFeatures) -> float:
+    small, large = (a.vector, b.vector) if len(a.vector) <= len(b.vector) else (b.vector, a.vector)
+    text = sum(w * large.get(t, 0) for t, w in small.items())
+    price = max(0.0, 1 - abs(a.price_band - b.price_band) / PRICE_BANDS_APART)
+    return TEXT_WEIGHT * text + CATEGORY_WEIGHT * (a.category_id == b.category_id) + PRICE_WEIGHT * price
+
+def _top(scored: Iterable[Tuple[int, float]], k: int = TOP_K) -> List[Tuple[int, float]]:
+    top = heapq.nlargest(k, scored, key=lambda item: (item[1], -item[0]))
+    return [(other, round(score, 6)) for other, score in top if score > 0]
+
+_FEATURE_COLUMNS = (Product.id, Product.name, Product.description, Product.category_id, Product.price_per_day)
+
+class SimilarityIndex:
+    """Fitur TF-IDF semua produk + inverted index token/kategori -> produk, supaya
+    skor hanya dihitung untuk produk yang punya kesamaan"""
+
+    def __init__(self, rows):
+        self.counts: Dict[int, Counter] = {}
+        self.document_frequency = Counter()
+        self.features: Dict[int, ProductFeatures] = {}
+        self.by_token = defaultdict(set)
+        self.by_category = defaultdict(set)
+        self.built_at = time.monotonic()
+        rows = list(rows)
+        for product_id, name, description, _, _ in rows:
+            self.counts[product_id] = term_counts(name, description)
+            self.document_frequency.update(self.counts[product_id].keys())
+        for product_id, _, _, category_id, price in rows:
+            self._index(self._features(product_id, category_id, price))
+
+    @classmethod
+    def build(cls, db: Session) -> "SimilarityIndex":
+        """Bangun dari seluruh katalog (IDF dari semua produk) dengan satu query kolom"""
+        return cls(db.query(*_FEATURE_COLUMNS).all())
+
+    def _features(self, product_id: int, category_id: int, price: float) -> ProductFeatures:
+        total = len(self.counts)
+        vector = {
+            token: (1 + math.log(count)) * (math.log((1 + total) / (1 + self.document_frequency[token])) + 1)
+            for token, count in self.counts[product_id].items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1
+        return ProductFeatures(product_id, category_id, price_band(price), {t: w / norm for t, w in vector.items()})
+
+    def _index(self, f: ProductFeatures):
+        self.features[f.id] = f
+        for token in f.vector:
+            self.by_token[token].add(f.id)
+        self.by_category[f.category_id].add(f.id)
+
+    def remove(self, product_id: int):
+        f = self.features.pop(product_id, None)
+        if f is None:
+            return
+        for token in f.vector:
+            self.by_token[token].discard(product_id)
+        self.by_category[f.category_id].discard(product_id)
+        self.document_frequency.subtract(self.counts.pop(product_id).keys())
+
+    def put(self, product_id: int, name: str, description: str, category_id: int, price: float):
+        """Tambah / ganti satu produk; vektornya memakai IDF saat ini, produk lain tidak dihitung ulang"""
+        self.remove(product_id)
+        self.counts[product_id] = term_counts(name, description)
+        self.document_frequency.update(self.counts[product_id].keys())
+        self._index(self._features(product_id, category_id, price))
+
+    def candidates(self, product_id: int) -> set:
+        f = self.features[product_id]
+        found = set(self.by_category[f.category_id])
+        for token in f.vector:
+            found |= self.by_token[token]
+        found.discard(product_id)
+        return found
+
+    def neighbors(self, product_id: int, k: int = TOP_K) -> List[Tuple[int, float]]:
+        f = self.features[product_id]
+        return _top(((other, similarity(f, self.features[other])) for other in self.candidates(product_id)), k)
+
+    def score(self, a: int, b: int) -> float:
+        return similarity(self.features[a], self.features[b])
+
+# Index di memori proses worker (lihat refresh_similar)
+_index: Optional[SimilarityIndex] = None
+_index_lock = threading.Lock()
+
+def _save(neighbors: Dict[int, List[Tuple[int, float]]], db: Session):
+    now = datetime.utcnow()
+    values = [
+        {"product_id": product_id, "neighbors": json.dumps(items, separators=(",", ":")), "updated_at": now}
+        for product_id, items in neighbors.items()
+    ]
+    for i in range(0, len(values), 500):
+        stmt = insert(ProductSimilarity).values(values[i:i + 500])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductSimilarity.product_id],
+            set_={"neighbors": stmt.excluded.neighbors, "updated_at": stmt.excluded.updated_at},
+        )
+        db.execute(stmt)
+
+def _owners_of(product_ids: Iterable[int], db: Session) -> set:
+    """Produk yang daftar tetangganya memuat salah satu product_ids (JSON [[id, skor], ...])"""
+    patterns = [ProductSimilarity.neighbors.like(f"%[{product_id},%") for product_id in product_ids]
+    return {owner for (owner,) in db.query(ProductSimilarity.product_id).filter(or_(*patterns))}
+
+def _load_neighbors(product_ids: Iterable[int], db: Session) -> Dict[int, List[Tuple[int, float]]]:
+    product_ids = list(product_ids)
+    stored = {}
+    for i in range(0, len(product_ids), 500):
+        rows = db.query(ProductSimilarity.product_id, ProductSimilarity.neighbors).filter(ProductSimilarity.product_id.in_(product_ids[i:i + 500]))
+        stored.update((product_id, [tuple(item) for item in json.loads(neighbors)]) for product_id, neighbors in rows)
+    return stored
+
+# Baca
+
+def get_similar_ids(product_id: int, db: Session, limit: int = TOP_K) -> Optional[List[int]]:
+    """Id produk serupa berurutan dari paling mirip. None jika index belum dibangun untuk produk ini"""
+    row = db.query(ProductSimilarity.neighbors).filter(ProductSimilarity.product_id == product_id).first()
+    if row is None:
+        return None
+    return [other for other, _ in json.loads(row.neighbors)[:limit]]
+
+# Tulis (tidak commit, kecuali rebuild)
+
+def refresh_similar(db: Session, product_ids: Iterable[int]):
+    """Perbarui index setelah produk berubah: hitung ulang tetangga produk tsb, lalu
+    sisipkan / keluarkan produk tsb dari daftar tetangga produk lain yang terdampak"""
+    global _index
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at > SIMILARITY_INDEX_TTL:
+            _index = SimilarityIndex.build(db)
+        index = _index
+        rows = {row[0]: row for row in db.query(*_FEATURE_COLUMNS).filter(Product.id.in_(product_ids))}
+        for product_id in product_ids:
+            if product_id in rows:
+                index.put(*rows[product_id])
+            else:
+                index.remove(product_id)
+        # Yang perlu diperbarui: produk yang kini menyimpan produk ini sebagai tetangga
+        # (dicari langsung di JSON, tidak bergantung pada isi index di memori) dan
+        # kandidat barunya (berbagi token / kategori)
+        affected = _owners_of(product_ids, db)
+        for product_id in rows:
+            affected |= index.candidates(product_id)
+        affected -= product_ids
+
+        neighbors = {product_id: index.neighbors(product_id) for product_id in rows}
+        changed = [product_id for product_id in product_ids if product_id in index.features]
+        for owner, stored in _load_neighbors(affected, db).items():
+            if owner not in index.features:
+                continue
+            kept = [(other, score) for other, score in stored if other not in product_ids]
+            new_scores = {other: round(index.score(owner, other), 6) for other in changed}
+            old_scores = {other: score for other, score in stored if other in product_ids}
+            if len(stored) >= TOP_K and any(new_scores.get(other, 0) < score for other, score in old_scores.items()):
+                # Produk yang turun skornya keluar dari daftar penuh: kandidat di luar daftar bisa masuk, hitung penuh
+                neighbors[owner] = index.neighbors(owner)
+            else:
+                neighbors[owner] = _top(kept + list(new_scores.items()))
+        # Pemilik yang belum punya baris (produk baru di sekitar) dihitung penuh
+        for owner in affected - neighbors.keys():
+            if owner in index.features:
+                neighbors[owner] = index.neighbors(owner)
+
+    removed = [product_id for product_id in product_ids if product_id not in rows]
+    if removed:
+        db.query(ProductSimilarity).filter(ProductSimilarity.product_id.in_(removed)).delete(synchronize_session=False)
+    _save(neighbors, db)
+
+def rebuild(db: Session):
+    """Bangun ulang index untuk seluruh katalog"""
+    global _index
+    with _index_lock:
+        _index = SimilarityIndex.build(db)
+        index = _index
+        # Job refresh yang masih antri sudah tercakup rebuild
+        db.query(Job).filter(Job.kind == "similarity.refresh", Job.status == "pending").delete(synchronize_session=False)
+        db.query(ProductSimilarity).delete(synchronize_session=False)
+        _save({product_id: index.neighbors(product_id) for product_id in index.features}, db)
+    db.commit()
+
+# Job: refresh index untuk produk yang berubah (di-enqueue otomatis oleh _queue_refresh)
+@job_handler("similarity.refresh")
+def refresh_products(payloads: List[dict], db: Session):
+    refresh_similar(db, {product_id for payload in payloads for product_id in payload["product_ids"]})
+
+@event.listens_for(Session, "after_flush")
+def _queue_refresh(session: Session, flush_context):
+    """Enqueue similarity.refresh di transaksi yang sama untuk produk yang dibuat, dihapus,
+    atau diubah kolom SIMILARITY_COLUMNS-nya. Bulk UPDATE (query.update) tidak terdeteksi"""
+    product_ids = {obj.id for obj in session.new if isinstance(obj, Product)}
+    product_ids |= {obj.id for obj in session.deleted if isinstance(obj, Product)}
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in SIMILARITY_COLUMNS):
+                product_ids.add(obj.id)
+    product_ids.discard(None)
+    if product_ids:
+        enqueue("similarity.refresh", {"product_ids": sorted(product_ids)}, session)
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print("Index produk serupa selesai dibangun.")
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import UploadFile
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Blob, User, ProductReview
+
+# Semua file upload disimpan berdasarkan hash isinya (content-addressed):
+#   ./uploads/blobs/ab/cd/abcd1234...{ext}
+# File dengan isi sama hanya disimpan sekali, nama tidak pernah bentrok,
+# dan isi sebuah URL tidak pernah berubah (aman di-cache selamanya).
+UPLOAD_ROOT = "./uploads"
+BLOB_DIRECTORY = os.path.join(UPLOAD_ROOT, "blobs")
+BLOB_URL_PREFIX = "/uploads/blobs/"
+# File sementara (upload yang sedang ditulis) di luar ./uploads supaya tidak
+# bisa diakses lewat /uploads. Harus satu filesystem dengan BLOB_DIRECTORY
+# supaya os.replace ke lokasi akhir tetap atomik.
+TMP_DIRECTORY = os.getenv("UPLOAD_TMP_DIRECTORY", "./upload_tmp")
+CHUNK_SIZE = 64 * 1024
+
+# Blob tanpa referensi baru dihapus setelah tidak dipakai selama masa tenggang
+# (last_used_at, disentuh setiap upload dengan isi sama), supaya upload yang
+# belum sempat di-commit tidak ikut terhapus GC.
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+# Helper
+
+def blob_relpath(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def blob_path(sha256: str, extension: str) -> str:
+    return os.path.join(BLOB_DIRECTORY, blob_relpath(sha256, extension))
+
+def blob_url(blob: Blob) -> str:
+    return BLOB_URL_PREFIX + blob_relpath(blob.sha256, blob.extension)
+
+def parse_blob_url(url: Optional[str]) -> Optional[str]:
+    """Ambil hash dari URL blob, None jika bukan URL blob (misal file lama / URL eksternal)"""
+    if not url or not url.startswith(BLOB_URL_PREFIX):
+        return None
+    name = os.path.basename(url)
+    sha256 = os.path.splitext(name)[0]
+    if len(sha256) != 64:
+        return None
+    return sha256
+
+def store_upload(file: UploadFile, extension: str, db: Session) -> Blob:
+    """Simpan file upload ke blob store, dedup berdasarkan sha256 isi file"""
+    hasher = hashlib.sha256()
+    size = 0
+    os.makedirs(TMP_DIRECTORY, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_DIRECTORY)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = file.file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        sha256 = hasher.hexdigest()
+
+        # Satu upsert (tanpa savepoint): blob baru dibuat, blob yang sudah ada
+        # (termasuk dari upload paralel) ditandai dipakai supaya GC tidak menghapusnya
+        now = datetime.utcnow()
+        stmt = insert(Blob).values(
+            sha256=sha256, extension=extension, size=size, ref_count=0, created_at=now, last_used_at=now
+        ).on_conflict_do_update(index_elements=[Blob.sha256], set_={"last_used_at": now}).returning(Blob.id)
+        blob = db.get(Blob, db.execute(stmt).scalar_one(), populate_existing=True)
+
+        path = blob_path(blob.sha256, blob.extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return blob
+
+def retain(blob: Blob):
+    blob.ref_count = (blob.ref_count or 0) + 1
+
+def release(url: Optional[str], db: Session):
+    """Kurangi ref_count blob yang direferensikan URL (no-op untuk URL non-blob)"""
+    sha256 = parse_blob_url(url)
+    if sha256 is None:
+        return
+    blob = db.query(Blob).filter(Blob.sha256 == sha256).first()
+    if blob and blob.ref_count > 0:
+        blob.ref_count -= 1
+
+def count_references(db: Session) -> Counter:
+    """Hitung ulang referensi blob dari User.profile_picture dan ProductReview.images"""
+    counts = Counter()
+    for (url,) in db.query(User.profile_picture).filter(User.profile_picture.like(BLOB_URL_PREFIX + "%")):
+        sha256 = parse_blob_url(url)
+        if sha256:
+            counts[sha256] += 1
+    for (images,) in db.query(ProductReview.images).filter(ProductReview.images.like(f"%{BLOB_URL_PREFIX}%")):
+        try:
+            urls = json.loads(images)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        for url in urls:
+            sha256 = parse_blob_url(url)
+            if sha256:
+                counts[sha256] += 1
+    return counts
+
+def collect_garbage(db: Session, grace_period: timedelta = GC_GRACE_PERIOD) -> int:
+    """Mark & sweep: sinkronkan ref_count lalu hapus blob yatim yang tidak dipakai selama masa tenggang"""
+    counts = count_references(db)
+    cutoff = datetime.utcnow() - grace_period
+    # Blob yang dipakai ulang setelah cutoff dilewati: referensi barunya bisa
+    # belum ter-commit saat dihitung di atas
+    idle = Blob.last_used_at < cutoff
+    for blob_id, sha256, ref_count in db.query(Blob.id, Blob.sha256, Blob.ref_count).filter(idle).all():
+        count = counts.get(sha256, 0)
+        if count != ref_count:
+            db.query(Blob).filter(Blob.id == blob_id, idle).update({Blob.ref_count: count}, synchronize_session=False)
+    # Dicek ulang di DELETE dalam transaksi yang sama; file dihapus sebelum commit
+    # selagi upload dengan isi sama masih menunggu lock tulis
+    deleted = db.execute(delete(Blob).where(Blob.ref_count == 0, idle).returning(Blob.sha256, Blob.extension)).all()
+    for sha256, extension in deleted:
+        path = blob_path(sha256, extension)
+        if os.path.exists(path):
+            os.remove(path)
+    db.commit()
+    removed = len(deleted)
+
+    # File di disk yang tidak tercatat di tabel blobs dan tmp sisa crash
+    known = {sha256 for (sha256,) in db.query(Blob.sha256)}
+    cutoff_ts = cutoff.timestamp()
+    for directory in (BLOB_DIRECTORY, TMP_DIRECTORY):
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if (directory == BLOB_DIRECTORY and os.path.splitext(name)[0] in known) or os.path.getmtime(path) >= cutoff_ts:
+                    continue
+                os.remove(path)
+                removed += 1
+    return removed
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        removed = collect_garbage(db)
+        print(f"{removed} blob yatim dihapus.")
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import uuid
+
+# DB dan direktori sementara harus di-set sebelum modul aplikasi di-import
+_TMP = tempfile.mkdtemp(prefix="camptogo-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["UPLOAD_TMP_DIRECTORY"] = os.path.join(_TMP, "upload_tmp")
+os.environ["JOB_WORKER_ENABLED"] = "0"
+os.environ.setdefault("ADMIN_API_KEY", "test-admin-key")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from auth import get_password_hash
+from db import SessionLocal
+from models import Address, Category, PaymentMethod, Product, User
+
+PASSWORD = "password123"
+_PASSWORD_HASH = get_password_hash(PASSWORD)
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(main.app)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def make_user(db) -> User:
+    user = User(full_name="Test User", email=f"{uuid.uuid4().hex[:12]}@example.com", hashed_password=_PASSWORD_HASH)
+    db.add(user)
+    db.commit()
+    return user
+
+def make_product(db, stock_quantity: int = 5, price_per_day: float = 50000, **fields) -> Product:
+    if "category_id" not in fields:
+        category = db.query(Category).first()
+        if category is None:
+            category = Category(name="Tenda", description="Tenda camping", icon_url="")
+            db.add(category)
+            db.flush()
+        fields["category_id"] = category.id
+    product = Product(
+        name=fields.pop("name", "Tenda Test 2P"),
+        description=fields.pop("description", "Tenda ringan untuk 2 orang"),
+        price_per_day=price_per_day,
+        original_price=price_per_day,
+        discount_percentage=0,
+        deposit_amount=fields.pop("deposit_amount", 100000),
+        stock_quantity=stock_quantity,
+        **fields,
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+def login(client, user: User) -> dict:
+    response = client.post("/auth/login", json={"email": user.email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": "Bearer " + response.json()["data"]["access_token"]}
+
+def make_checkout_ready(db, user: User):
+    """Alamat dan metode pembayaran untuk POST /orders. Return (address_id, payment_method_id)"""
+    address = Address(user_id=user.id, recipient_name="Test", full_address="Jl. Test 1", phone_number="0812")
+    payment = PaymentMethod(user_id=user.id, method_type="bank", provider_name="BCA", account_number="123", account_name="Test")
+    db.add_all([address, payment])
+    db.commit()
+    return address.id, payment.id
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+import analytics
+from models import DailyStats, ProductDailyStats
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def snapshot(db):
+    daily = sorted(tuple(row) for row in db.query(DailyStats.day, DailyStats.order_count, DailyStats.revenue_cents, DailyStats.deposit_in_cents, DailyStats.deposit_out_cents))
+    products = sorted(tuple(row) for row in db.query(ProductDailyStats.day, ProductDailyStats.product_id, ProductDailyStats.units_on_rent, ProductDailyStats.revenue_cents))
+    return daily, products
+
+def test_revenue_excludes_deposit_and_matches_rebuild(client, db):
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db, price_per_day=10000.01, deposit_amount=250000)
+    today = datetime.utcnow().date()
+    before = analytics.revenue_report(today, today, db)[0]
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-11-01", "end_date": "2031-11-03", "quantity": 1})
+    assert client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id}).status_code == 200
+
+    after = analytics.revenue_report(today, today, db)[0]
+    # 3 hari x 10000.01; deposit hanya masuk deposit_in, bukan omzet
+    assert round(after["revenue"] - before["revenue"], 2) == 30000.03
+    assert round(after["deposit_in"] - before["deposit_in"], 2) == 250000
+    live = snapshot(db)
+    per_day = {day: revenue for day, product_id, _, revenue in live[1] if product_id == product.id}
+    assert sum(per_day.values()) == 3000003
+    assert sorted(per_day.values()) == [1000001, 1000001, 1000001]
+    report = analytics.product_report(date(2031, 11, 1), date(2031, 11, 3), db)
+    assert next(r for r in report if r["product_id"] == product.id)["revenue"] == 30000.03
+
+    analytics.rebuild(db)
+    assert snapshot(db) == live
@@ -0,0 +1,32 @@
+from models import Product
+from tests.conftest import login, make_product, make_user
+
+def test_cart_reflects_price_changes_immediately(client, db):
+    user = make_user(db)
+    headers = login(client, user)
+    product = make_product(db, price_per_day=10000, deposit_amount=50000)
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-12-01", "end_date": "2031-12-02", "quantity": 1})
+    assert client.get("/cart/summary", headers=headers).json()["data"]["total_rental"] == 20000
+    assert client.get("/cart", headers=headers).json()["data"]["summary"]["total_rental"] == 20000
+
+    # Harga diubah di luar request cart (admin / proses lain)
+    db.query(Product).filter(Product.id == product.id).update({Product.price_per_day: 15000})
+    db.commit()
+    summary = client.get("/cart/summary", headers=headers).json()["data"]
+    assert summary["total_rental"] == 30000 and summary["total_amount"] == 80000
+    cart = client.get("/cart", headers=headers).json()["data"]
+    assert cart["summary"]["total_rental"] == 30000
+    assert cart["items"][0]["product"]["price_per_day"] == 15000
+
+def test_batch_update_returns_same_summary_as_summary_endpoint(client, db):
+    headers = login(client, make_user(db))
+    a = make_product(db, price_per_day=10000.1, deposit_amount=0.35)
+    b = make_product(db, price_per_day=20000.05, deposit_amount=0.35)
+    response = client.patch("/cart", headers=headers, json={"operations": [
+        {"op": "add", "product_id": a.id, "start_date": "2031-12-10", "end_date": "2031-12-12", "quantity": 2},
+        {"op": "add", "product_id": b.id, "start_date": "2031-12-10", "end_date": "2031-12-10", "quantity": 1},
+    ]})
+    assert response.status_code == 200, response.text
+    summary = response.json()["data"]
+    assert summary == client.get("/cart/summary", headers=headers).json()["data"]
+    assert (summary["item_count"], summary["total_quantity"], summary["total_rental"]) == (2, 3, 80000.65)
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+import orders
+from availability import ReservationConflict
+from models import Order, OrderItem, ReservationDay
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+START, END = "2031-05-01", "2031-05-03"
+BUYERS = 8
+
+def test_concurrent_checkouts_never_overbook(client, db):
+    product = make_product(db, stock_quantity=1)
+    setups = []
+    user_ids = []
+    for _ in range(BUYERS):
+        user = make_user(db)
+        user_ids.append(user.id)
+        headers = login(client, user)
+        address_id, payment_id = make_checkout_ready(db, user)
+        response = client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": START, "end_date": END, "quantity": 1})
+        assert response.status_code == 200, response.text
+        setups.append((headers, address_id, payment_id))
+
+    def checkout(setup):
+        headers, address_id, payment_id = setup
+        return client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id}).status_code
+
+    with ThreadPoolExecutor(BUYERS) as pool:
+        codes = list(pool.map(checkout, setups))
+
+    assert codes.count(200) == 1, codes
+    assert set(codes) <= {200, 400, 409}, codes
+    booked = db.query(func.coalesce(func.sum(OrderItem.quantity), 0)).filter(OrderItem.product_id == product.id).scalar()
+    assert booked == 1
+    # Checkout yang kalah tidak boleh meninggalkan order kosong
+    assert db.query(Order).filter(Order.user_id.in_(user_ids)).count() == 1
+    reserved = [r for (r,) in db.query(ReservationDay.reserved).filter(ReservationDay.product_id == product.id).order_by(ReservationDay.day)]
+    assert reserved == [1, 1, 1]
+
+def test_non_busy_database_error_is_not_reported_as_conflict(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    user = make_user(db)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    calls = []
+
+    def broken_place_order(*args):
+        calls.append(1)
+        raise OperationalError("INSERT INTO orders ...", {}, Exception("no such column: orders.foo"))
+
+    monkeypatch.setattr(orders, "place_order", broken_place_order)
+    response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+    assert response.status_code == 500
+    assert len(calls) == 1
+
+def test_conflict_after_order_number_leaves_no_order(client, db, monkeypatch):
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db)
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": START, "end_date": END, "quantity": 1})
+
+    def conflicting_book(*args):
+        raise ReservationConflict([product.id])
+
+    monkeypatch.setattr(orders, "book", conflicting_book)
+    response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+    assert response.status_code == 409
+    db.expire_all()
+    assert db.query(Order).filter(Order.user_id == user.id).count() == 0
@@ -0,0 +1,48 @@
+import uuid
+
+from sqlalchemy import text
+
+import orders
+from availability import ReservationConflict
+from coupons import coupon_registry
+from models import Coupon
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def make_coupon(db, usage_limit: int) -> Coupon:
+    coupon = Coupon(code="HEMAT" + uuid.uuid4().hex[:8].upper(), discount_amount=10000, usage_limit=usage_limit, used_count=0)
+    db.add(coupon)
+    db.commit()
+    coupon_registry.reload(db)
+    return coupon
+
+def test_rolled_back_checkouts_do_not_use_up_coupon(client, db, monkeypatch):
+    coupon = make_coupon(db, usage_limit=3)
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db)
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-08-01", "end_date": "2031-08-01", "quantity": 1})
+
+    def conflicting_book(*args):
+        raise ReservationConflict([product.id])
+
+    monkeypatch.setattr(orders, "book", conflicting_book)
+    for _ in range(3):
+        response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id, "coupon_code": coupon.code})
+        assert response.status_code == 409
+
+    db.refresh(coupon)
+    assert coupon.used_count == 0
+    info, message = coupon_registry.validate(coupon.code, db)
+    assert info is not None and info.used_count == 0, message
+
+def test_savepoint_release_does_not_count_redemption(db):
+    coupon = make_coupon(db, usage_limit=1)
+    info, _ = coupon_registry.validate(coupon.code, db)
+    assert coupon_registry.redeem(info, db)
+    # RELEASE savepoint bukan commit transaksi luar; hitungan registry baru naik setelah commit
+    with db.begin_nested():
+        db.execute(text("SELECT 1"))
+    db.rollback()
+    info, message = coupon_registry.validate(coupon.code, db)
+    assert info is not None and info.used_count == 0, message
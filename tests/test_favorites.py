@@ -0,0 +1,57 @@
+from tests.conftest import login, make_product, make_user
+
+def test_batch_rejects_ids_in_more_than_one_list(client, db):
+    headers = login(client, make_user(db))
+    a, b = make_product(db), make_product(db)
+    for body in ({"add": [a.id], "remove": [a.id]}, {"add": [a.id], "toggle": [a.id]}, {"remove": [b.id], "toggle": [a.id, b.id]}):
+        response = client.post("/favorites/batch", headers=headers, json=body)
+        assert response.status_code == 400, body
+    assert client.get("/favorites/ids", headers=headers).json()["data"] == []
+
+def test_batch_toggle_flips_current_state(client, db):
+    headers = login(client, make_user(db))
+    a, b, c = make_product(db), make_product(db), make_product(db)
+    assert client.post(f"/favorites/{a.id}", headers=headers).status_code == 200
+    data = client.post("/favorites/batch", headers=headers, json={"add": [c.id], "toggle": [a.id, b.id]}).json()["data"]
+    assert data["added"] == sorted([b.id, c.id]) and data["removed"] == [a.id]
+    assert data["ids"] == sorted([b.id, c.id])
+
+def test_favorites_list_keeps_old_shape_and_page_endpoint_paginates(client, db):
+    headers = login(client, make_user(db))
+    products = [make_product(db) for _ in range(3)]
+    for product in products:
+        assert client.post(f"/favorites/{product.id}", headers=headers).status_code == 200
+
+    listing = client.get("/favorites", headers=headers).json()["data"]
+    assert [item["id"] for item in listing] == [p.id for p in products]
+
+    first = client.get("/favorites/page?limit=2", headers=headers).json()["data"]
+    rest = client.get(f"/favorites/page?limit=2&cursor={first['pagination']['next_cursor']}", headers=headers).json()["data"]
+    assert [item["id"] for item in first["favorites"] + rest["favorites"]] == [p.id for p in reversed(products)]
+    assert not rest["pagination"]["has_next"]
+
+def test_favorite_cards_show_current_product_data(client, db):
+    from models import Product
+    headers = login(client, make_user(db))
+    product = make_product(db, price_per_day=10000)
+    client.post(f"/favorites/{product.id}", headers=headers)
+    assert client.get("/favorites/page", headers=headers).json()["data"]["favorites"][0]["price_per_day"] == 10000
+    # Diubah di luar proses / request favorites
+    db.query(Product).filter(Product.id == product.id).update({Product.price_per_day: 12000, Product.rating: 4.5})
+    db.commit()
+    card = client.get("/favorites/page", headers=headers).json()["data"]["favorites"][0]
+    assert (card["price_per_day"], card["rating"]) == (12000, 4.5)
+    assert client.get("/favorites", headers=headers).json()["data"][0]["price_per_day"] == 12000
+
+def test_favorite_ids_see_writes_from_other_workers(client, db):
+    from datetime import datetime
+    from models import Favorite
+    user = make_user(db)
+    headers = login(client, user)
+    product = make_product(db)
+    assert client.get("/favorites/ids", headers=headers).json()["data"] == []
+    # Ditulis proses / worker lain langsung ke DB
+    db.add(Favorite(user_id=user.id, product_id=product.id, added_at=datetime.utcnow()))
+    db.commit()
+    assert client.get("/favorites/ids", headers=headers).json()["data"] == [product.id]
+    assert client.get(f"/products/{product.id}", headers=headers).json()["data"]["is_favorited"] is True
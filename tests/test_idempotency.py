@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+
+import idempotency
+import main
+import orders
+from models import IdempotencyKey, Order
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def test_crash_after_checkout_commit_replays_instead_of_rerunning(db, monkeypatch):
+    client = TestClient(main.app, raise_server_exceptions=False)
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db)
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-08-01", "end_date": "2031-08-02", "quantity": 1})
+    body = {"address_id": address_id, "payment_method_id": payment_id}
+    headers = {**headers, "Idempotency-Key": "checkout-crash"}
+
+    # Proses mati tepat setelah checkout commit, sebelum response dikirim
+    checkout = orders.checkout
+    def crashing_checkout(*args):
+        checkout(*args)
+        raise RuntimeError("worker mati")
+    monkeypatch.setattr(orders, "checkout", crashing_checkout)
+    assert client.post("/orders", headers=headers, json=body).status_code == 500
+    monkeypatch.setattr(orders, "checkout", checkout)
+
+    record = db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user.id, IdempotencyKey.key == "checkout-crash").one()
+    assert record.status == "completed"
+    response = client.post("/orders", headers=headers, json=body)
+    assert response.status_code == 200, response.text
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert db.query(Order).filter(Order.user_id == user.id).count() == 1
+
+def test_released_key_retry_is_bounded(client, db, monkeypatch):
+    user = make_user(db)
+    headers = login(client, user)
+    sleeps = []
+    monkeypatch.setattr(idempotency, "_acquire", lambda *args: (False, None))
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT", 0.05)
+    monkeypatch.setattr(idempotency.time, "sleep", lambda seconds: sleeps.append(seconds))
+    response = client.post("/cart", headers={**headers, "Idempotency-Key": "spin"}, json={"product_id": 1, "start_date": "2031-08-01", "end_date": "2031-08-02", "quantity": 1})
+    assert response.status_code == 409
+    assert sleeps and all(s == idempotency.IDEMPOTENCY_POLL_INTERVAL for s in sleeps)
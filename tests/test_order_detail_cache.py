@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from db import SessionLocal, engine
+from order_lifecycle import order_detail_cache, transition_orders
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+@contextmanager
+def count_statements():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+def order_with_lines(client, db, lines: int):
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    for i in range(lines):
+        product = make_product(db)
+        client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-10-01", "end_date": "2031-10-02", "quantity": 1})
+    response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+    assert response.status_code == 200, response.text
+    return headers, response.json()["data"]["order_id"]
+
+def test_order_detail_query_count_does_not_grow_with_items(client, db):
+    counts = []
+    for lines in (1, 5):
+        headers, order_id = order_with_lines(client, db, lines)
+        order_detail_cache.pop(order_id)
+        with count_statements() as statements:
+            assert client.get(f"/orders/{order_id}", headers=headers).status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1], counts
+
+def test_cached_order_detail_is_revalidated_against_version(client, db):
+    headers, order_id = order_with_lines(client, db, 2)
+    with count_statements() as cold:
+        assert client.get(f"/orders/{order_id}", headers=headers).status_code == 200
+    with count_statements() as warm:
+        assert client.get(f"/orders/{order_id}", headers=headers).json()["data"]["status"] == "pending"
+    # Hanya cek version yang tersisa dari 4 query detail
+    assert len(warm) == len(cold) - 3, (cold, warm)
+
+    # Transisi dari "proses lain": cache lokal tidak di-invalidate, tetapi version berubah
+    other = SessionLocal()
+    assert transition_orders([order_id], "ongoing", other) == [order_id]
+    other.commit()
+    other.close()
+    data = client.get(f"/orders/{order_id}", headers=headers).json()["data"]
+    assert data["status"] == "ongoing"
+    assert [t["status"] for t in data["timeline"]] == ["pending", "ongoing"]
+
+def test_cached_order_detail_is_not_served_to_other_users(client, db):
+    headers, order_id = order_with_lines(client, db, 1)
+    assert client.get(f"/orders/{order_id}", headers=headers).status_code == 200
+    stranger = login(client, make_user(db))
+    assert client.get(f"/orders/{order_id}", headers=stranger).status_code == 404
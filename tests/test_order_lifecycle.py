@@ -0,0 +1,66 @@
+import threading
+
+from db import SessionLocal
+from models import Order, OrderTimeline, ReservationDay
+from order_lifecycle import transition_orders
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def place_order(client, db, product, start="2031-06-01", end="2031-06-02") -> int:
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": start, "end_date": end, "quantity": 1})
+    response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["order_id"]
+
+def race_transition(order_id: int, to_status: str, workers: int = 4) -> list:
+    """Jalankan transition_orders yang sama dari beberapa thread/session sekaligus"""
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def run():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            moved = transition_orders([order_id], to_status, session)
+            session.commit()
+            results.append(moved)
+        except Exception as e:
+            session.rollback()
+            results.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=run) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def timeline_count(db, order_id: int, status: str) -> int:
+    return db.query(OrderTimeline).filter(OrderTimeline.order_id == order_id, OrderTimeline.status == status).count()
+
+def test_concurrent_transitions_move_and_release_once(client, db):
+    product = make_product(db, stock_quantity=1)
+    order_id = place_order(client, db, product)
+
+    results = race_transition(order_id, "ongoing")
+    assert results.count([order_id]) == 1, results
+    assert timeline_count(db, order_id, "ongoing") == 1
+
+    results = race_transition(order_id, "returned")
+    assert results.count([order_id]) == 1, results
+    assert timeline_count(db, order_id, "returned") == 1
+    assert db.query(Order.status).filter(Order.id == order_id).scalar() == "returned"
+    reserved = [r for (r,) in db.query(ReservationDay.reserved).filter(ReservationDay.product_id == product.id)]
+    assert reserved == [0, 0]
+
+def test_transition_skips_orders_in_wrong_status(client, db):
+    product = make_product(db)
+    order_id = place_order(client, db, product)
+    assert transition_orders([order_id], "returned", db) == []
+    assert transition_orders([order_id], "ongoing", db) == [order_id]
+    assert transition_orders([order_id], "ongoing", db) == []
+    db.rollback()
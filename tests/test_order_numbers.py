@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from db import SessionLocal
+from models import Order, OrderWorkerLease
+import order_numbers
+from order_numbers import WORKER_LEASE, WorkerIdLease
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def test_processes_lease_distinct_worker_ids(db):
+    leases = [WorkerIdLease() for _ in range(3)]
+    ids = []
+    for lease in leases:
+        session = SessionLocal()
+        ids.append(lease.current(session))
+        session.commit()
+        session.close()
+    assert len(set(ids)) == 3
+    owners = dict(db.query(OrderWorkerLease.worker_id, OrderWorkerLease.owner).filter(OrderWorkerLease.worker_id.in_(ids)))
+    assert [owners[i] for i in ids] == [lease.owner for lease in leases]
+
+def test_expired_lease_is_taken_over(db):
+    stale = WorkerIdLease()
+    worker_id = stale.current(db)
+    db.query(OrderWorkerLease).filter(OrderWorkerLease.worker_id == worker_id).update({OrderWorkerLease.heartbeat_at: datetime.utcnow() - WORKER_LEASE * 2})
+    db.commit()
+    fresh = WorkerIdLease()
+    assert fresh.current(db) == worker_id
+    db.commit()
+    # Pemilik lama kehilangan lease saat memperpanjang dan mengklaim id lain
+    stale._renewed_at = 0
+    assert stale.current(db) != worker_id
+    db.commit()
+
+def test_checkout_retries_on_order_number_collision(client, db, monkeypatch):
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db)
+    taken = db.query(Order.order_number).first()
+    if taken is None:
+        other = make_user(db)
+        other_headers = login(client, other)
+        other_address, other_payment = make_checkout_ready(db, other)
+        client.post("/cart", headers=other_headers, json={"product_id": product.id, "start_date": "2031-07-01", "end_date": "2031-07-01", "quantity": 1})
+        client.post("/orders", headers=other_headers, json={"address_id": other_address, "payment_method_id": other_payment})
+        taken = db.query(Order.order_number).first()
+
+    numbers = iter([taken[0]])
+    original = order_numbers.generate_order_number
+    monkeypatch.setattr("orders.generate_order_number", lambda session: next(numbers, None) or original(session))
+    client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": "2031-07-02", "end_date": "2031-07-02", "quantity": 1})
+    response = client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id})
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["order_number"] != taken[0]
@@ -0,0 +1,17 @@
+from tests.conftest import login, make_checkout_ready, make_product, make_user
+
+def test_order_list_accepts_legacy_page_and_cursor(client, db):
+    user = make_user(db)
+    headers = login(client, user)
+    address_id, payment_id = make_checkout_ready(db, user)
+    product = make_product(db)
+    for day in range(1, 4):
+        client.post("/cart", headers=headers, json={"product_id": product.id, "start_date": f"2031-09-0{day}", "end_date": f"2031-09-0{day}", "quantity": 1})
+        assert client.post("/orders", headers=headers, json={"address_id": address_id, "payment_method_id": payment_id}).status_code == 200
+
+    first = client.get("/orders?limit=2", headers=headers).json()["data"]
+    by_cursor = client.get(f"/orders?limit=2&cursor={first['pagination']['next_cursor']}", headers=headers).json()["data"]
+    by_page = client.get("/orders?limit=2&page=2", headers=headers).json()["data"]
+    assert [o["id"] for o in by_page["orders"]] == [o["id"] for o in by_cursor["orders"]]
+    assert len(by_page["orders"]) == 1 and not by_page["pagination"]["has_next"]
+    assert client.get(f"/orders?page=1&cursor={first['pagination']['next_cursor']}", headers=headers).status_code == 400
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+import popularity
+from models import PopularityState, Product
+from tests.conftest import login, make_product, make_user
+
+def set_epoch(db, epoch: datetime):
+    popularity._lock_epoch(db)
+    db.query(PopularityState).filter(PopularityState.id == 1).update({PopularityState.epoch: epoch})
+    db.commit()
+
+def test_old_epoch_is_moved_forward_and_scores_rescaled(client, db):
+    half_life = timedelta(days=popularity.POPULARITY_HALF_LIFE_DAYS)
+    # 2000 half-life: faktor 2^2000 akan overflow tanpa rescale
+    set_epoch(db, datetime.utcnow() - half_life * 2000 - timedelta(hours=1))
+    old, new = make_product(db), make_product(db)
+    db.query(Product).filter(Product.id == old.id).update({Product.popularity_score: 3.0 * 2 ** 1000})
+    db.commit()
+
+    headers = login(client, make_user(db))
+    assert client.post(f"/favorites/{new.id}", headers=headers).status_code == 200
+
+    db.expire_all()
+    epoch = db.query(PopularityState.epoch).scalar()
+    assert datetime.utcnow() - epoch < half_life
+    scores = dict(db.query(Product.id, Product.popularity_score).filter(Product.id.in_([old.id, new.id])))
+    assert scores[old.id] == 3.0 * 2 ** -1000
+    assert 1.0 <= scores[new.id] < 2.0
+
+    # Menghapus favorit mengurangi bobot yang sama persis dengan epoch baru
+    assert client.delete(f"/favorites/{new.id}", headers=headers).status_code == 200
+    db.expire_all()
+    assert abs(db.query(Product.popularity_score).filter(Product.id == new.id).scalar()) < 1e-12
@@ -0,0 +1,44 @@
+import uuid
+
+import jobs
+import similarity
+from models import Category, Job, Product
+from tests.conftest import make_product
+
+def pending_refresh_ids(db):
+    ids = set()
+    for (payload,) in db.query(Job.payload).filter(Job.kind == "similarity.refresh", Job.status == "pending"):
+        ids |= set(similarity.json.loads(payload)["product_ids"])
+    return ids
+
+def run_jobs(db):
+    while jobs.run_due_jobs(db):
+        pass
+
+def test_product_writes_refresh_the_index_incrementally(db):
+    category = Category(name=f"Kompor {uuid.uuid4().hex[:6]}", description="", icon_url="")
+    db.add(category)
+    db.commit()
+    stove = make_product(db, name="Kompor portable gas butane", description="kompor lipat camping", category_id=category.id)
+    lantern = make_product(db, name="Lampu lentera LED", description="lentera gantung baterai", category_id=category.id)
+    similarity.rebuild(db)
+    assert similarity.get_similar_ids(stove.id, db) == [lantern.id]
+
+    # Produk baru lewat ORM: otomatis masuk antrian dan jadi tetangga produk yang mirip
+    burner = make_product(db, name="Kompor gas portable mini", description="kompor butane lipat", category_id=category.id)
+    assert burner.id in pending_refresh_ids(db)
+    run_jobs(db)
+    assert similarity.get_similar_ids(stove.id, db)[0] == burner.id
+    assert similarity.get_similar_ids(burner.id, db)[0] == stove.id
+
+    # Perubahan kolom yang tidak memengaruhi skor tidak memicu refresh
+    lantern.rating = 4.8
+    db.commit()
+    assert lantern.id not in pending_refresh_ids(db)
+
+    # Dihapus: keluar dari daftar tetangga produk lain
+    db.delete(db.get(Product, burner.id))
+    db.commit()
+    run_jobs(db)
+    assert burner.id not in similarity.get_similar_ids(stove.id, db)
+    assert similarity.get_similar_ids(burner.id, db) is None
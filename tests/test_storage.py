@@ -0,0 +1,66 @@
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import UploadFile
+
+import storage
+from models import Blob
+from storage import blob_path, blob_url, collect_garbage, retain, store_upload
+from tests.conftest import make_user
+
+@pytest.fixture(autouse=True)
+def blob_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BLOB_DIRECTORY", str(tmp_path / "blobs"))
+
+def upload(content: bytes, db) -> Blob:
+    return store_upload(UploadFile(file=io.BytesIO(content), filename="foto.png"), ".png", db)
+
+def age(blob: Blob, db):
+    """Seolah-olah blob terakhir dipakai jauh sebelum masa tenggang GC"""
+    blob.created_at = blob.last_used_at = datetime.utcnow() - storage.GC_GRACE_PERIOD * 2
+    db.commit()
+
+def test_same_content_is_stored_once(db):
+    content = uuid.uuid4().bytes
+    first = upload(content, db)
+    retain(first)
+    db.commit()
+    second = upload(content, db)
+    retain(second)
+    db.commit()
+    assert second.id == first.id
+    assert second.ref_count == 2
+    assert db.query(Blob).filter(Blob.sha256 == first.sha256).count() == 1
+    with open(blob_path(first.sha256, first.extension), "rb") as f:
+        assert f.read() == content
+
+def test_gc_removes_only_unreferenced_idle_blobs(db):
+    orphan = upload(uuid.uuid4().bytes, db)
+    used = upload(uuid.uuid4().bytes, db)
+    retain(used)
+    user = make_user(db)
+    user.profile_picture = blob_url(used)
+    age(orphan, db)
+    age(used, db)
+    orphan_path, used_path = blob_path(orphan.sha256, ".png"), blob_path(used.sha256, ".png")
+
+    collect_garbage(db)
+    assert not os.path.exists(orphan_path)
+    assert db.query(Blob).filter(Blob.sha256 == orphan.sha256).count() == 0
+    assert os.path.exists(used_path)
+    assert db.query(Blob.ref_count).filter(Blob.sha256 == used.sha256).scalar() == 1
+
+def test_gc_skips_blob_reused_within_grace_period(db):
+    content = uuid.uuid4().bytes
+    blob = upload(content, db)
+    age(blob, db)
+    # Upload ulang dengan isi sama; referensinya belum ter-commit saat GC berjalan
+    upload(content, db)
+    db.commit()
+
+    collect_garbage(db)
+    assert db.query(Blob).filter(Blob.sha256 == blob.sha256).count() == 1
+    assert os.path.exists(blob_path(blob.sha256, ".png"))
@@ -0,0 +1,51 @@
+import os
+from mimetypes import guess_type
+from typing import Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from storage import parse_blob_url
+
+# File blob tidak pernah berubah isinya, jadi boleh di-cache selamanya.
+# File lama (nama berbasis timestamp) tetap di-cache singkat saja.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# Jika di-set (misal "/_uploads/"), response hanya berisi header X-Accel-Redirect
+# dan byte file dikirim langsung oleh reverse proxy (nginx internal location).
+ACCEL_REDIRECT_PREFIX = os.getenv("UPLOADS_ACCEL_REDIRECT_PREFIX")
+
+class UploadFiles(StaticFiles):
+    """StaticFiles untuk /uploads dengan cache header, ETag kuat untuk blob dan opsi X-Accel-Redirect.
+
+    Range, If-Range dan If-None-Match ditangani FileResponse/StaticFiles bawaan;
+    zero-copy dipakai otomatis jika server ASGI mendukung ekstensi http.response.pathsend.
+    """
+
+    def __init__(self, *args, accel_redirect_prefix: Optional[str] = ACCEL_REDIRECT_PREFIX, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accel_redirect_prefix = accel_redirect_prefix
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relpath = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        sha256 = parse_blob_url("/uploads/" + relpath)
+
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL if sha256 else DEFAULT_CACHE_CONTROL}
+        if sha256:
+            # Nama file = hash isi, jadi bisa langsung dipakai sebagai ETag kuat
+            headers["ETag"] = f'"{sha256}"'
+
+        response = FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        if self.accel_redirect_prefix and status_code == 200:
+            accel_headers = {key: response.headers[key] for key in ("cache-control", "etag", "last-modified")}
+            accel_headers["X-Accel-Redirect"] = self.accel_redirect_prefix.rstrip("/") + "/" + relpath
+            return Response(headers=accel_headers, media_type=guess_type(full_path)[0] or "application/octet-stream")
+        return response
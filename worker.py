@@ -0,0 +1,10 @@
+import logging
+
+# Proses worker job queue terpisah dari API: python worker.py
+# Import main supaya semua modul yang mendaftarkan @job_handler ikut dimuat.
+import main  # noqa: F401
+from jobs import run_worker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_worker()